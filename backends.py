@@ -0,0 +1,232 @@
+"""Model backends behind DebateEngine.
+
+A backend supplies the four things the engine needs from the outside world:
+a chat model and structured-output models (as LangChain runnables, so the
+engine's prompt chains stay the same), transcription and speech synthesis.
+
+GeminiBackend is the production one. FakeBackend answers locally with
+configurable latency, jitter and failure rate and always returns objects
+that validate against the requested schema, so the app can be run,
+load-tested and profiled offline.
+"""
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+import typing
+from io import BytesIO
+from typing import Protocol
+
+import google.generativeai as genai
+from gtts import gTTS
+from langchain_core.messages import AIMessageChunk
+from langchain_core.runnables import Runnable, RunnableGenerator, RunnableLambda
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+
+class Backend(Protocol):
+    name: str
+
+    def chat_model(self) -> Runnable:
+        """Runnable taking a prompt value and returning/streaming AI message chunks."""
+
+    def structured(self, schema) -> Runnable:
+        """Runnable taking a prompt value and returning an instance of `schema`."""
+
+    def transcribe(self, audio_bytes, mime_type, prompt) -> str: ...
+
+    def synthesize(self, text, lang_code) -> bytes: ...
+
+
+class GeminiBackend:
+    name = "gemini"
+
+    def __init__(self, api_key, model="gemini-2.5-flash", temperature=0.8):
+        self.llm = ChatGoogleGenerativeAI(
+            model=model,
+            google_api_key=api_key,
+            temperature=temperature
+        )
+        genai.configure(api_key=api_key)
+        self.transcriber = genai.GenerativeModel(model)
+
+    def chat_model(self):
+        return self.llm
+
+    def structured(self, schema):
+        return self.llm.with_structured_output(schema)
+
+    def transcribe(self, audio_bytes, mime_type, prompt):
+        response = self.transcriber.generate_content([prompt, {"mime_type": mime_type, "data": bytes(audio_bytes)}])
+        return response.text
+
+    def synthesize(self, text, lang_code):
+        fp = BytesIO()
+        gTTS(text=text, lang=lang_code).write_to_fp(fp)
+        return fp.getvalue()
+
+
+class FakeBackendError(RuntimeError):
+    """A simulated failure; `retryable` tells the scheduler to retry it, as it would a 429 or 5xx."""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+_FAKE_SENTENCES = [
+    "That claim collapses the moment you look at who actually pays for it.",
+    "History shows the opposite every time this has been tried at scale.",
+    "You are confusing a correlation with a cause, and the data says so.",
+    "If your premise were true, we would already see the effect everywhere.",
+    "The real question is not whether it is possible but whether it is worth it.",
+    "Your argument quietly assumes the conclusion it is trying to prove.",
+]
+
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz), about 26 ms of audio.
+_SILENT_MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+
+
+class FakeBackend:
+    """Deterministic local stand-in for Gemini and gTTS.
+
+    Text and schema contents depend only on the prompt, so runs are
+    reproducible. Timing is `latency` +/- `jitter` seconds to the first
+    token, then `chunk_delay` per streamed word. Each call fails with
+    probability `failure_rate` by raising FakeBackendError. The failures
+    are final unless `transient` is set, in which case the scheduler
+    retries them like rate-limit or server errors.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=0.3, jitter=0.1, chunk_delay=0.01, failure_rate=0.0, transient=False, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_delay = chunk_delay
+        self.failure_rate = failure_rate
+        self.transient = transient
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        with self._lock:
+            fail = self._rng.random() < self.failure_rate
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+        return delay, fail
+
+    @staticmethod
+    def _seeded(prompt):
+        return random.Random(hashlib.sha256(str(prompt).encode("utf-8")).digest())
+
+    def _reply_words(self, prompt):
+        rng = self._seeded(prompt)
+        return " ".join(rng.sample(_FAKE_SENTENCES, 2)).split(" ")
+
+    def _chunks(self, prompt):
+        words = self._reply_words(prompt)
+        for i, word in enumerate(words):
+            usage = {"input_tokens": len(prompt) // 4 if i == 0 else 0, "output_tokens": 1}
+            usage["total_tokens"] = usage["input_tokens"] + 1
+            yield AIMessageChunk(content=word if i == len(words) - 1 else word + " ", usage_metadata=usage)
+
+    def _transform(self, inputs):
+        prompt = "".join(p.to_string() for p in inputs)
+        delay, fail = self._delay()
+        time.sleep(delay)
+        if fail: raise FakeBackendError("Simulated backend failure", self.transient)
+        for i, chunk in enumerate(self._chunks(prompt)):
+            if i: time.sleep(self.chunk_delay)
+            yield chunk
+
+    async def _atransform(self, inputs):
+        prompt = "".join([p.to_string() async for p in inputs])
+        delay, fail = self._delay()
+        await asyncio.sleep(delay)
+        if fail: raise FakeBackendError("Simulated backend failure", self.transient)
+        for i, chunk in enumerate(self._chunks(prompt)):
+            if i: await asyncio.sleep(self.chunk_delay)
+            yield chunk
+
+    def chat_model(self):
+        return RunnableGenerator(self._transform, self._atransform)
+
+    def _fill(self, schema, rng, prompt=""):
+        # Lists honour an "exactly N" in the prompt (batched judging asks for one item per exchange).
+        wanted = re.search(r"exactly (\d+)", prompt)
+        count = int(wanted.group(1)) if wanted else 3
+        values = {}
+        for name, field in schema.model_fields.items():
+            kind = field.annotation
+            if name == "winner":
+                values[name] = rng.choice(["user", "ai", "draw"])
+            elif hasattr(kind, "model_fields"):
+                values[name] = self._fill(kind, rng, prompt)
+            elif kind is int:
+                values[name] = rng.randint(20, 95)
+            elif typing.get_origin(kind) in (list, typing.List):
+                item = typing.get_args(kind)[0] if typing.get_args(kind) else str
+                values[name] = [self._fill(item, rng, prompt) if hasattr(item, "model_fields") else rng.choice(_FAKE_SENTENCES)
+                                for _ in range(count)]
+            elif name == "fallacies_detected":
+                values[name] = rng.choice(["None", "Strawman", "Ad hominem", "Slippery slope"])
+            else:
+                values[name] = rng.choice(_FAKE_SENTENCES)
+        return schema(**values)
+
+    def structured(self, schema):
+        def run(prompt):
+            delay, fail = self._delay()
+            time.sleep(delay)
+            if fail: raise FakeBackendError("Simulated backend failure", self.transient)
+            return self._fill(schema, self._seeded(prompt.to_string()), prompt.to_string())
+
+        async def arun(prompt):
+            delay, fail = self._delay()
+            await asyncio.sleep(delay)
+            if fail: raise FakeBackendError("Simulated backend failure", self.transient)
+            return self._fill(schema, self._seeded(prompt.to_string()), prompt.to_string())
+
+        return RunnableLambda(run, afunc=arun)
+
+    def transcribe(self, audio_bytes, mime_type, prompt):
+        delay, fail = self._delay()
+        time.sleep(delay)
+        if fail: raise FakeBackendError("Simulated backend failure", self.transient)
+        return self._seeded(bytes(audio_bytes)).choice(_FAKE_SENTENCES)
+
+    def synthesize(self, text, lang_code):
+        delay, fail = self._delay()
+        time.sleep(delay)
+        if fail: raise FakeBackendError("Simulated backend failure", self.transient)
+        # About 50 ms of silence per character, close to real speech length.
+        return _SILENT_MP3_FRAME * max(1, len(text) * 2)
+
+
+def backend_from_env(api_key=None):
+    """Backend named by DEBATE_BACKEND (default "gemini").
+
+    The fake backend also reads DEBATE_FAKE_LATENCY, DEBATE_FAKE_JITTER,
+    DEBATE_FAKE_FAILURE_RATE and DEBATE_FAKE_TRANSIENT=1, so a whole app can
+    be switched over from outside.
+    """
+    name = os.environ.get("DEBATE_BACKEND", "gemini")
+    options = {}
+    if name == "fake":
+        for option in ("latency", "jitter", "failure_rate"):
+            value = os.environ.get(f"DEBATE_FAKE_{option.upper()}")
+            if value is not None: options[option] = float(value)
+        options["transient"] = os.environ.get("DEBATE_FAKE_TRANSIENT") == "1"
+    return make_backend(name, api_key, **options)
+
+
+def make_backend(name="gemini", api_key=None, **options):
+    """Build a backend by name ("gemini" or "fake"); options go to its constructor."""
+    if name == "fake":
+        return FakeBackend(**options)
+    if name == "gemini":
+        return GeminiBackend(api_key, **options)
+    raise ValueError(f"Unknown backend: {name}")
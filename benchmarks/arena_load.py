@@ -0,0 +1,268 @@
+"""Load test: many concurrent arena sessions driven through Streamlit's AppTest.
+
+Sessions are spread over worker processes. Within a worker they are all
+alive at once and share one cached DebateEngine on the offline fake
+backend, like sessions on one Streamlit worker.
+Each session plays full User vs AI games until the game-over screen, then
+one AI vs AI simulation. The results are written as JSON. Pass
+--baseline to print the change against an earlier result file.
+
+    python benchmarks/arena_load.py --sessions 20 --latency 0.3 --out bench.json
+    python benchmarks/arena_load.py --sessions 20 --baseline bench.json
+    python benchmarks/arena_load.py --sessions 20 --turn-mode combined --baseline bench.json
+"""
+import argparse
+import itertools
+import json
+import os
+import pickle
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "streamlit_app.py")
+
+ARGUMENTS = [
+    "Automation removes jobs faster than new ones appear, so a floor is needed.",
+    "Every pilot programme showed people kept working after receiving the money.",
+    "It simplifies welfare and cuts the bureaucracy that eats current budgets.",
+    "Inflation fears are overstated when the payment is funded by taxes.",
+    "Freedom to refuse exploitative work raises wages at the bottom.",
+    "Carers and volunteers finally get paid for work the economy already relies on.",
+    "A guaranteed income lets people retrain instead of taking the first job offered.",
+    "Means-tested benefits trap people, because earning more costs them their support.",
+]
+# Each turn argues a different pair of points, so the local pre-judge never sees a repeat.
+PAIRS = list(itertools.combinations(ARGUMENTS, 2))
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, q):
+    if not values: return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))], 4)
+
+
+def widget(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+
+class Counters:
+    def __init__(self):
+        self.reruns = 0
+        self.prejudged = 0
+        self.turns = []
+        self.game_over = []
+        self.sims = []
+        self.state_bytes = []
+        self.failures = []
+        self.rss_growth = []
+
+    def merge(self, other):
+        self.reruns += other["reruns"]
+        self.prejudged += other["prejudged"]
+        for name in ("turns", "game_over", "sims", "state_bytes", "failures", "rss_growth"):
+            getattr(self, name).extend(other[name])
+
+
+def state_bytes(at):
+    """Pickled size of the session's state; values that can't be pickled (locks, futures) are skipped."""
+    total = 0
+    for key in at.session_state:
+        try:
+            total += len(pickle.dumps(at.session_state[key]))
+        except Exception:
+            pass
+    return total
+
+
+def run(target, counters):
+    """Run the script for an AppTest, or for the AppTest behind a changed widget."""
+    at = target.run()
+    counters.reruns += 1
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at
+
+
+def session_steps(index, args, counters):
+    """One scripted session; yields after every rerun so a worker can interleave sessions."""
+    from streamlit.testing.v1 import AppTest
+
+    at = run(AppTest.from_file(APP, default_timeout=args.timeout), counters)
+    yield
+    for game in range(args.games):
+        widget(at.sidebar.radio, "Who starts?").set_value("AI (Opponent)" if game % 2 else "Me (User)")
+        game_start = time.perf_counter()
+        run(widget(at.sidebar.button, "Start Debate 🔥").click(), counters)
+        yield
+
+        for turn in range(args.max_turns):
+            if at.session_state["user_hp"] <= 0 or at.session_state["ai_hp"] <= 0:
+                break
+            start = time.perf_counter()
+            run(at.chat_input[0].set_value(" ".join(PAIRS[(index + turn) % len(PAIRS)])), counters)
+            if at.session_state["crowd_text"].startswith("The judges wave it off"):
+                counters.prejudged += 1  # scored locally, so kept out of the model-backed turn latency
+            else:
+                counters.turns.append(time.perf_counter() - start)
+            yield
+
+        if at.session_state["user_hp"] > 0 and at.session_state["ai_hp"] > 0:
+            run(widget(at.sidebar.button, "QUIT ☠️").click(), counters)
+        counters.game_over.append(time.perf_counter() - game_start)
+        counters.state_bytes.append(state_bytes(at))
+        run(widget(at.button, "Start New Debate").click(), counters)
+        yield
+
+    for _ in range(args.sims):
+        run(widget(at.sidebar.radio, "Mode:").set_value("AI vs AI (Simulation)"), counters)
+        start = time.perf_counter()
+        run(widget(at.sidebar.button, "Run Simulation 🎬").click(), counters)
+        counters.sims.append(time.perf_counter() - start)
+        yield
+        run(widget(at.button, "Clear Arena").click(), counters)
+        run(widget(at.sidebar.radio, "Mode:").set_value("User vs AI"), counters)
+        yield
+
+
+def worker(indices, args):
+    """Play the given sessions round-robin in this process, all of them alive at once.
+
+    AppTest keeps a process-global runtime, so runs inside one process are
+    serialized; parallelism comes from running several worker processes.
+    One uncounted warm-up session runs first, so imports, the engine and
+    caches filled on first use are not counted as per-session RSS growth.
+    """
+    from streamlit.testing.v1 import AppTest  # noqa: F401 - import cost is not per-session
+
+    counters = Counters()
+    try:
+        for _ in session_steps(-1, args, Counters()): pass
+    except Exception as e:
+        counters.failures.append(f"warm-up: {e!r}")
+    rss_before = rss_mb()
+    sessions = [session_steps(i, args, counters) for i in indices]
+    while sessions:
+        for steps in list(sessions):
+            try:
+                next(steps)
+            except StopIteration:
+                sessions.remove(steps)
+            except Exception as e:
+                counters.failures.append(repr(e))
+                sessions.remove(steps)
+    counters.rss_growth.append((rss_mb() - rss_before) / max(1, len(indices)))
+    return vars(counters)  # AppTest swaps __main__, so the class itself doesn't pickle back
+
+
+def summarize(args, counters, wall):
+    def dist(values):
+        return {
+            "n": len(values),
+            "mean": round(statistics.mean(values), 4) if values else None,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+
+    return {
+        "config": vars(args),
+        "env": {"python": platform.python_version(), "platform": platform.platform()},
+        "wall_s": round(wall, 3),
+        "reruns": counters.reruns,
+        "reruns_per_s": round(counters.reruns / wall, 2),
+        "turn_latency_s": dist(counters.turns),
+        "prejudged_turns": counters.prejudged,
+        "time_to_game_over_s": dist(counters.game_over),
+        "simulation_s": dist(counters.sims),
+        "session_state_bytes": dist(counters.state_bytes),
+        "rss_mb": {
+            "growth_per_session": round(statistics.mean(counters.rss_growth), 2) if counters.rss_growth else None,
+        },
+        "failures": counters.failures,
+    }
+
+
+def compare(result, baseline):
+    rows = [
+        ("reruns/s", ("reruns_per_s",)),
+        ("turn p50", ("turn_latency_s", "p50")),
+        ("turn p95", ("turn_latency_s", "p95")),
+        ("turn p99", ("turn_latency_s", "p99")),
+        ("game over p50", ("time_to_game_over_s", "p50")),
+        ("RSS MB/session", ("rss_mb", "growth_per_session")),
+    ]
+    for label, path in rows:
+        new, old = result, baseline
+        for key in path:
+            new, old = (new or {}).get(key), (old or {}).get(key)
+        if new is None or old is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {label:<16} {old:>10} -> {new:<10} {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive concurrent arena sessions headlessly and report latency and memory.")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="Worker processes sharing the sessions")
+    parser.add_argument("--games", type=int, default=2, help="User vs AI games per session")
+    parser.add_argument("--sims", type=int, default=1, help="AI vs AI simulations per session")
+    parser.add_argument("--max-turns", type=int, default=25, help="Turns before a game is ended with QUIT")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake backend seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Fake backend +/- jitter seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fake backend failure fraction")
+    parser.add_argument("--turn-mode", choices=["split", "combined"], default="split",
+                        help="Rebuttal and verdict as two calls or one (DEBATE_TURN_MODE)")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per script run")
+    parser.add_argument("--out", default="bench_arena.json", help="Where to write the JSON result")
+    parser.add_argument("--baseline", help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    os.environ["DEBATE_BACKEND"] = "fake"
+    os.environ["DEBATE_FAKE_LATENCY"] = str(args.latency)
+    os.environ["DEBATE_FAKE_JITTER"] = str(args.jitter)
+    os.environ["DEBATE_FAKE_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["DEBATE_TURN_MODE"] = args.turn_mode
+    scratch = tempfile.mkdtemp(prefix="arena-bench-")
+    os.environ.setdefault("DEBATE_AUDIO_CACHE_DIR", os.path.join(scratch, "audio"))
+    os.environ.setdefault("DEBATE_OPENING_CACHE", os.path.join(scratch, "openings.db"))
+    os.environ.setdefault("DEBATE_STORE", os.path.join(scratch, "debates.db"))
+
+    counters = Counters()
+    processes = min(args.processes, args.sessions)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        jobs = [pool.submit(worker, list(range(p, args.sessions, processes)), args) for p in range(processes)]
+        for job in jobs:
+            counters.merge(job.result())
+    result = summarize(args, counters, time.perf_counter() - start)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps({k: v for k, v in result.items() if k not in ("config", "env")}, indent=2))
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print(f"Compared to {args.baseline}:")
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Micro-benchmark for the local pre-judge (prejudge.check).
+
+Replays debates of --history turns in every language and times the check on
+a mix of fresh arguments, repeats, junk and wrong-script replies. Earlier
+turns are fingerprinted once, as in the app, so the timing is the per-turn
+cost. Exits non-zero if p99 is over --budget-ms.
+
+    python benchmarks/prejudge_bench.py --history 40 --turns 5000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prejudge import check  # noqa: E402
+
+SENTENCES = {
+    "en": ["Automation removes jobs faster than new ones appear, so a floor is needed.",
+           "Every pilot programme showed people kept working after receiving the money.",
+           "It simplifies welfare and cuts the bureaucracy that eats current budgets.",
+           "Inflation fears are overstated when the payment is funded by taxes."],
+    "hi": ["स्वचालन नई नौकरियों से तेज़ी से पुरानी नौकरियाँ खत्म कर रहा है।",
+           "हर प्रयोग में लोग पैसा मिलने के बाद भी काम करते रहे।",
+           "इससे कल्याण योजनाएँ सरल होंगी और नौकरशाही का खर्च घटेगा।"],
+    "ta": ["தானியங்கி முறை புதிய வேலைகளை விட வேகமாக வேலைகளை அழிக்கிறது.",
+           "ஒவ்வொரு சோதனையிலும் மக்கள் பணம் பெற்ற பிறகும் வேலை செய்தனர்."],
+}
+JUNK = ["ok", "no u", "lol lol lol lol lol lol lol", "???", "bla bla bla bla bla bla"]
+
+
+def argument(rng, lang, turn):
+    words = " ".join(rng.choice(SENTENCES[lang]) for _ in range(3))
+    return f"{words} ({turn})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time prejudge.check per user turn.")
+    parser.add_argument("--turns", type=int, default=5000, help="Checks to time")
+    parser.add_argument("--history", type=int, default=40, help="Earlier turns in each debate")
+    parser.add_argument("--budget-ms", type=float, default=1.0, help="Fail if p99 exceeds this")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the result as JSON here")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    timings, verdicts = [], {}
+    for n in range(args.turns):
+        lang = rng.choice(list(SENTENCES))
+        if n % 50 == 0:  # a new debate every 50 checks
+            history = [{"role": ("user", "assistant")[i % 2], "content": argument(rng, lang, i)} for i in range(args.history)]
+            for msg in history: check(msg["content"], [], lang)  # warm the fingerprints, as earlier turns would have
+        kind = rng.random()
+        if kind < 0.1: text = rng.choice(JUNK)
+        elif kind < 0.2: text = rng.choice(history)["content"]
+        elif kind < 0.3: text = argument(rng, "hi" if lang != "hi" else "ta", n)
+        else: text = argument(rng, lang, -n)
+        start = time.perf_counter()
+        verdict = check(text, history, lang)
+        timings.append((time.perf_counter() - start) * 1000)
+        key = verdict.kind if verdict else "judge"
+        verdicts[key] = verdicts.get(key, 0) + 1
+
+    ordered = sorted(timings)
+    result = {
+        "turns": args.turns, "history": args.history,
+        "mean_ms": round(statistics.mean(timings), 4),
+        "p50_ms": round(ordered[len(ordered) // 2], 4),
+        "p99_ms": round(ordered[int(0.99 * len(ordered))], 4),
+        "max_ms": round(ordered[-1], 4),
+        "verdicts": verdicts,
+    }
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if result["p99_ms"] > args.budget_ms:
+        raise SystemExit(f"p99 {result['p99_ms']} ms is over the {args.budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main()
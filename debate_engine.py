@@ -0,0 +1,869 @@
+import asyncio
+import contextvars
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List
+
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
+
+from backends import backend_from_env
+from memory import DebateMemory, format_turns
+from metrics import Metrics
+from opening_cache import OpeningCache
+from prejudge import check as check_turn
+from scheduler import RequestScheduler
+from transcription import AudioClip, TranscriptCache, prepare, read_upload
+
+AUDIO_CACHE_DIR = os.environ.get(
+    "DEBATE_AUDIO_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".audio_cache")
+)
+
+LANGUAGES = {
+    "English": "en",
+    "Hindi": "hi",
+    "Gujarati": "gu",
+    "Marathi": "mr",
+    "Tamil": "ta",
+    "Telugu": "te",
+    "Kannada": "kn",
+    "Punjabi": "pa"
+}
+
+
+DEFAULT_TOPIC = "Universal Basic Income"
+
+TOPICS = [
+    "Is cereal a soup?", "AI will replace teachers", "Cats are better than dogs", 
+    "Pineapple belongs on pizza", "Mars colonization is a waste",
+    "Social media does more harm than good", "Video games cause violence",
+    "Messi or Ronaldo: Who's the GOAT?",
+]
+
+USER_PERSONAS = ["Logical Vulcan", "Sarcastic Troll", "Philosopher", "Devil's Advocate"]
+SIM_PROPONENTS = ["Elon Musk-esque", "Idealist Student"]
+SIM_OPPONENTS = ["Grumpy Boomer", "Data Scientist"]
+
+def opening_combinations(topics=None, languages=None):
+    """Every (topic, persona, stance, language) the app can ask an opening for.
+
+    User-mode personas open on either side; in simulations only the
+    proponent opens, arguing For.
+    """
+    sides = [(p, s) for p in USER_PERSONAS for s in ("For", "Against")] + [(p, "For") for p in SIM_PROPONENTS]
+    return [(t, p, s, lang) for t in topics or [DEFAULT_TOPIC] + TOPICS for lang in languages or LANGUAGES for p, s in sides]
+
+# Rebuttal exchanges in an AI vs AI simulation, after the proponent's opening.
+SIM_ROUNDS = 4
+
+# "split" streams the rebuttal and judges it in a second call; "combined" gets
+# both from one structured call and falls back to "split" if that fails.
+TURN_MODES = ("split", "combined")
+TURN_MODE = os.environ.get("DEBATE_TURN_MODE", "split")
+
+# How simulations are scored: each exchange judged in the background as soon as it
+# exists ("parallel"), all of them in one structured call at the end ("batch"), or not at all.
+SIM_SCORING_MODES = ("parallel", "batch", "off")
+SIM_SCORING = os.environ.get("DEBATE_SIM_SCORING", "parallel")
+
+# Rough budget the rate limiter reserves for a reply on top of the prompt
+# (about 4 characters per token), and for a short voice clip.
+OUTPUT_TOKEN_ESTIMATE = 400
+TRANSCRIBE_TOKEN_ESTIMATE = 1000
+
+# Sessions whose current turn id is remembered (see start_turn); the oldest are forgotten first.
+MAX_TRACKED_SESSIONS = 1000
+
+class TurnScore(BaseModel):
+    user_logic: int = Field(..., description="0-100 score for logic")
+    ai_logic: int = Field(..., description="0-100 score for logic")
+    winner: str = Field(..., description="'user', 'ai', or 'draw'")
+    reasoning: str = Field(..., description="Brief reason for the score")
+    fallacies_detected: str = Field(..., description="Name any logical fallacies used (or 'None')")
+
+class RebuttalVerdict(BaseModel):
+    rebuttal: str = Field(..., description="Your counter-argument, written in the target language")
+    verdict: TurnScore = Field(..., description="Impartial score of the opponent's argument (user) and your rebuttal (ai)")
+
+class SimScorecard(BaseModel):
+    exchanges: List[TurnScore] = Field(..., description="One score per exchange, in the order given")
+
+class FinalAnalysis(BaseModel):
+    winner: str
+    best_point_user: str = Field(..., description="Quote the user's strongest argument")
+    weakest_point_user: str = Field(..., description="Quote the user's weakest argument")
+    improvement_tips: List[str] = Field(..., description="3 specific things the user should remember to improve")
+
+OPENING_TEMPLATE = """
+        You are {persona}. Topic: {topic}. Stance: {stance}.
+        Target Language: {language}.
+        
+        Generate a sharp, provocative 2-sentence opening argument completely in {language}.
+        DO NOT use English unless the requested language is English.
+        DO NOT be neutral. Pick a side and fight for it.
+        """
+
+REBUTTAL_TEMPLATE = """
+        You are {persona}. Topic: {topic}. Stance: {stance}.
+        Target Language: {language}.
+        History: {hist_text}
+        Opponent says: "{argument}"
+        
+        TASK: Dissect the opponent's argument and provide a logical counter-point.
+        CONSTRAINT: 
+        1. Write the response STRICTLY in {language}.
+        2. Never say "I disagree". Instead, explain WHY they are wrong.
+        3. Keep it under 3 sentences.
+        """
+
+JUDGE_TEMPLATE = """
+        Judge turn. Topic: {topic}.
+        User: "{user_arg}"
+        AI: "{ai_arg}"
+        
+        Score logic (0-100) strictly based on facts and reasoning.
+        """
+
+COMBINED_TEMPLATE = """
+        You are {persona}. Topic: {topic}. Stance: {stance}.
+        Target Language: {language}.
+        History: {hist_text}
+        Opponent says: "{argument}"
+        
+        TASK 1 (rebuttal): Dissect the opponent's argument and provide a logical counter-point.
+        CONSTRAINT: 
+        1. Write the rebuttal STRICTLY in {language}.
+        2. Never say "I disagree". Instead, explain WHY they are wrong.
+        3. Keep it under 3 sentences.
+        
+        TASK 2 (verdict): Now step out of character and judge the turn as an impartial judge.
+        The opponent's argument is the user's, your rebuttal is the AI's.
+        Score logic (0-100) strictly based on facts and reasoning.
+        """
+
+SIM_JUDGE_TEMPLATE = """
+        Judge an AI vs AI debate exchange by exchange. Topic: {topic}.
+        "User" is the proponent ({p1}, For); "AI" is the opponent ({p2}, Against).
+        
+        {exchanges}
+        
+        Return exactly {count} scores, one per exchange, in order.
+        Score logic (0-100) strictly based on facts and reasoning.
+        """
+
+REPORT_TEMPLATE = """
+        Analyze the full debate history. Topic: {topic}.
+        History: {history}
+        Target Language for output: {language}
+        
+        Task:
+        1. Identify the Winner.
+        2. Find the User's BEST point (quote it).
+        3. Find the User's WEAKEST point (quote it).
+        4. Provide 3 specific tips for the user to improve next time.
+        
+        IMPORTANT: Ensure the 'improvement_tips' and analysis are written in {language}.
+        """
+
+SUMMARY_TEMPLATE = """
+        You keep running notes on a debate. Topic: {topic}.
+        Notes so far: {summary}
+        New turns:
+        {turns}
+        
+        Rewrite the notes to include the new turns, in {language}, in at most {words} words.
+        Keep each side's main claims and any concessions, and keep short verbatim quotes
+        of the user's strongest and weakest points. Output only the notes.
+        """
+
+def turn_damage(score):
+    """HP lost by (user, ai) for one judged exchange: the loser takes the logic gap, at least 10."""
+    if score.winner == "ai": return max(10, int(score.ai_logic - score.user_logic)), 0
+    if score.winner == "user": return 0, max(10, int(score.user_logic - score.ai_logic))
+    return 0, 0
+
+def sim_exchanges(turns):
+    """(proponent argument, opponent argument) for each pair of consecutive simulation turns."""
+    pairs = []
+    for prev, cur in zip(turns, turns[1:]):
+        p1_turn, p2_turn = (prev, cur) if prev["role"] == "user" else (cur, prev)
+        pairs.append((p1_turn["content"], p2_turn["content"]))
+    return pairs
+
+def sim_errors(turns):
+    """Failed model calls in a simulation: generating each turn plus judging the exchange it closes."""
+    return sum(bool(t.get("timing", {}).get("error")) + bool(t.get("timing", {}).get("judge", {}).get("error"))
+               for t in turns)
+
+def summarize_simulation(turns, p1, p2):
+    """Score timeline and a FinalAnalysis-style summary for both personas.
+
+    Each turn after the first may carry a "score" (a TurnScore dict) for the
+    exchange it closes. HP follows the same damage rules as User vs AI mode.
+    "errors" counts failed calls (see sim_errors()); a failed judge call is
+    still scored as its fallback draw, so check it before trusting the result.
+    """
+    pairs = sim_exchanges(turns)
+    timeline, hp = [], {"user": 100, "ai": 100}
+    logic = {"user": [], "ai": []}
+    for i, turn in enumerate(turns[1:]):
+        score = turn.get("score")
+        if not score: continue
+        s = TurnScore(**score)
+        user_dmg, ai_dmg = turn_damage(s)
+        hp["user"], hp["ai"] = max(0, hp["user"] - user_dmg), max(0, hp["ai"] - ai_dmg)
+        logic["user"].append((s.user_logic, pairs[i][0]))
+        logic["ai"].append((s.ai_logic, pairs[i][1]))
+        timeline.append({
+            "exchange": i + 1, "winner": {"user": p1, "ai": p2}.get(s.winner, "draw"),
+            f"{p1} logic": s.user_logic, f"{p2} logic": s.ai_logic,
+            f"{p1} HP": hp["user"], f"{p2} HP": hp["ai"], "fallacies": s.fallacies_detected,
+        })
+
+    def side(key, persona, stance):
+        scored = logic[key]
+        return {
+            "persona": persona, "stance": stance, "hp": hp[key],
+            "avg_logic": round(sum(l for l, _ in scored) / len(scored), 1) if scored else None,
+            "exchanges_won": sum(1 for t in timeline if t["winner"] == persona),
+            "best_point": max(scored, key=lambda x: x[0])[1] if scored else None,
+            "weakest_point": min(scored, key=lambda x: x[0])[1] if scored else None,
+        }
+
+    summary = {"user": side("user", p1, "For"), "ai": side("ai", p2, "Against")}
+    ranking = lambda k: (summary[k]["hp"], summary[k]["avg_logic"] or 0)
+    if not timeline or ranking("user") == ranking("ai"): winner = "draw"
+    else: winner = p1 if ranking("user") > ranking("ai") else p2
+    return {"winner": winner, "proponent": summary["user"], "opponent": summary["ai"], "timeline": timeline,
+            "errors": sim_errors(turns)}
+
+class AudioCache:
+    """Content-addressed mp3 store: a small in-memory LRU in front of a bounded directory.
+
+    Keys are hashes of (text, lang_code), so messages only need to carry the key.
+    Both tiers evict least recently used entries once over their byte limit.
+    """
+
+    def __init__(self, root=AUDIO_CACHE_DIR, max_memory_bytes=32 * 2**20, max_disk_bytes=256 * 2**20):
+        self.root = root
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._mem = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._disk_bytes = sum(e.stat().st_size for e in os.scandir(root) if e.name.endswith(".mp3"))
+
+    @staticmethod
+    def key(text, lang_code):
+        return hashlib.sha256(f"{lang_code}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.mp3")
+
+    def _remember(self, key, data):
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                return
+            self._mem[key] = data
+            self._mem_bytes += len(data)
+            while self._mem_bytes > self.max_memory_bytes and len(self._mem) > 1:
+                _, old = self._mem.popitem(last=False)
+                self._mem_bytes -= len(old)
+
+    def get(self, key):
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.move_to_end(key)
+                return data
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        self._remember(key, data)
+        path = self._path(key)
+        if os.path.exists(path): return
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes += len(data)
+            over = self._disk_bytes > self.max_disk_bytes
+        if over: self._evict_disk()
+
+    def _evict_disk(self):
+        entries = sorted(
+            (e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(self.root) if e.name.endswith(".mp3")
+        )
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes * 0.9: break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+def split_sentences(text):
+    parts = re.split(r"(?<=[.!?।])\s+", text.strip())
+    return [p for p in parts if p]
+
+class DebateEngine:
+    """Shared by every session in the process (see get_engine in streamlit_app.py).
+
+    The backend clients (Gemini by default, see backends.py) and all prompt
+    chains are built once here; they hold no per-session state, so concurrent
+    reruns can use them from different script threads and reuse the same
+    HTTP connections. Set DEBATE_BACKEND=fake to run fully offline.
+    """
+
+    def __init__(self, api_key=None, backend=None, turn_mode=None, sim_scoring=None, quota_share=1.0):
+        self.turn_mode = turn_mode or TURN_MODE
+        if self.turn_mode not in TURN_MODES:
+            raise ValueError(f"Unknown turn mode: {self.turn_mode}")
+        self.sim_scoring = sim_scoring or SIM_SCORING
+        if self.sim_scoring not in SIM_SCORING_MODES:
+            raise ValueError(f"Unknown simulation scoring mode: {self.sim_scoring}")
+        api_key = api_key or os.environ.get("GOOGLE_API_KEY", "PASTE_YOUR_KEY_HERE")
+        self.created_at = time.time()
+        self.init_error = None
+        self._lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="debate")
+        self.tts_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tts")
+        self.audio = AudioCache()
+        self.openings = OpeningCache()
+        self.transcripts = TranscriptCache()
+        self._loop = None
+        self._turns = OrderedDict()  # session_id -> (turn id, futures still running for it)
+        self.metrics = Metrics()
+        self.scheduler = RequestScheduler(metrics=self.metrics, share=quota_share)
+        self.metrics.gauge("turn_mode", self.turn_mode, 1)  # labels every export with the mode it measured
+        self._uses = {"opening": 0, "rebuttal": 0, "judge": 0, "report": 0, "transcribe": 0, "speak": 0, "memory": 0, "combined": 0}
+        try:
+            self.backend = backend or backend_from_env(api_key)
+            llm = self.backend.chat_model()
+            self.opening_chain = ChatPromptTemplate.from_template(OPENING_TEMPLATE) | llm
+            self.rebuttal_chain = ChatPromptTemplate.from_template(REBUTTAL_TEMPLATE) | llm
+            self.judge_chain = ChatPromptTemplate.from_template(JUDGE_TEMPLATE) | self.backend.structured(TurnScore)
+            self.sim_judge_chain = ChatPromptTemplate.from_template(SIM_JUDGE_TEMPLATE) | self.backend.structured(SimScorecard)
+            self.report_chain = ChatPromptTemplate.from_template(REPORT_TEMPLATE) | self.backend.structured(FinalAnalysis)
+            self.combined_chain = ChatPromptTemplate.from_template(COMBINED_TEMPLATE) | self.backend.structured(RebuttalVerdict)
+            self.summary_chain = ChatPromptTemplate.from_template(SUMMARY_TEMPLATE) | llm
+        except Exception as e:
+            self.init_error = e
+
+    def _used(self, name):
+        with self._lock:
+            self._uses[name] += 1
+
+    def reuse_stats(self):
+        """How many calls each shared client/chain has served since startup."""
+        with self._lock:
+            uses = dict(self._uses)
+        return {"uptime_s": round(time.time() - self.created_at, 1), "calls": uses, "total_calls": sum(uses.values())}
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="debate-loop", daemon=True).start()
+            return self._loop
+
+    def run_async(self, coro, session_id=None, turn_id=None):
+        """Run a coroutine on the engine's event loop thread; returns a concurrent Future.
+
+        The caller's metrics session carries over. With a session and turn id
+        (see start_turn), the job is cancelled as soon as a newer turn starts.
+        """
+        job = asyncio.run_coroutine_threadsafe(coro, self._event_loop())
+        if session_id is None: return job
+        with self._lock:
+            current, jobs = self._turns.get(session_id, (0, []))
+            if current == turn_id:
+                jobs[:] = [j for j in jobs if not j.done()] + [job]
+        if current != turn_id:
+            job.cancel()
+        return job
+
+    def start_turn(self, session_id):
+        """Begin a new turn for the session and return its id.
+
+        Anything still running for the session's earlier turns is cancelled,
+        so a superseded rebuttal or verdict stops costing API calls and its
+        result is never applied (check is_current before using one).
+        """
+        with self._lock:
+            turn_id, stale = self._turns.pop(session_id, (0, []))
+            self._turns[session_id] = (turn_id + 1, [])
+            while len(self._turns) > MAX_TRACKED_SESSIONS:
+                self._turns.popitem(last=False)
+        for job in stale:
+            if job.cancel(): self.metrics.count("cancelled", "turn")
+        return turn_id + 1
+
+    def is_current(self, session_id, turn_id):
+        with self._lock:
+            return self._turns.get(session_id, (0,))[0] == turn_id
+
+    def _synthesize(self, sentence, lang_code):
+        self._used("speak")
+        with self.metrics.span("tts.sentence"):
+            data = self.backend.synthesize(sentence, lang_code)
+        self.metrics.observe("prompt_chars", "tts.sentence", len(sentence))
+        return data
+
+    async def aspeak_sentences(self, text, lang_code='en'):
+        """Yield the mp3 of each sentence of `text`, in order, as soon as it is ready.
+
+        All sentences are synthesized concurrently, so the first one can start
+        playing while the rest are still on their way. The joined clip is then
+        cached for replay; a clip that is already cached is yielded whole.
+        """
+        key = AudioCache.key(text, lang_code)
+        cached = self.audio.get(key)
+        if cached is not None:
+            yield cached
+            return
+        loop = asyncio.get_running_loop()
+        jobs = [loop.run_in_executor(self.tts_pool, contextvars.copy_context().run, self._synthesize, s, lang_code)
+                for s in split_sentences(text)]
+        parts = []
+        try:
+            for job in jobs:
+                parts.append(await job)
+                yield parts[-1]
+        finally:
+            for job in jobs: job.cancel()
+        data = b"".join(parts)
+        if data: self.audio.put(key, data)
+
+    async def aspeak(self, text, lang_code='en', first=None):
+        """Synthesize `text` and return its audio cache key (None on failure).
+
+        `first`, a concurrent Future, gets the first sentence's mp3 (or None)
+        as soon as it is ready, so playback can start before the rest is done.
+        """
+        try:
+            if not text: return None
+            with self.metrics.span("speak"):
+                async for clip in self.aspeak_sentences(text, lang_code):
+                    if first and not first.done(): first.set_result(clip)
+            key = AudioCache.key(text, lang_code)
+            return key if self.audio.get(key) else None
+        except Exception:
+            self.metrics.count("fallbacks", "speak")
+            return None
+        finally:
+            if first and not first.done(): first.set_result(None)
+
+    async def atranscribe(self, audio, language_name="English"):
+        """Transcript of an uploaded file or AudioClip; raises on API errors so the caller can surface them."""
+        clip = audio if isinstance(audio, AudioClip) else read_upload(audio)
+        cached = self.transcripts.get(clip.digest, language_name)
+        if cached is not None:
+            self.metrics.count("cache_hits", "transcribe")
+            return cached
+        self._used("transcribe")
+        with self.metrics.span("transcribe.prepare"):
+            payload, mime_type = prepare(clip)
+        prompt = f"Transcribe this audio exactly as spoken. The language is likely {language_name}."
+        loop = asyncio.get_running_loop()
+        with self.metrics.span("transcribe"):
+            text = await self.scheduler.arun(
+                lambda: loop.run_in_executor(self.pool, self.backend.transcribe, payload, mime_type, prompt),
+                "interactive", TRANSCRIBE_TOKEN_ESTIMATE, stage="transcribe"
+            )
+        self.metrics.observe("upload_bytes", "transcribe", len(clip.data))
+        self.metrics.observe("prompt_chars", "transcribe", len(payload))
+        self.metrics.observe("response_chars", "transcribe", len(text or ""))
+        self.transcripts.put(clip.digest, language_name, text)
+        return text
+
+    @staticmethod
+    def _count_tokens(timing, message):
+        usage = getattr(message, "usage_metadata", None) or {}
+        for field in ("input_tokens", "output_tokens"):
+            if usage.get(field):
+                timing[field] = timing.get(field, 0) + usage[field]
+
+    def _record(self, stage, timing, inputs, response):
+        m = self.metrics
+        m.observe("latency_seconds", stage, timing.get("total", 0))
+        if "ttft" in timing: m.observe("ttft_seconds", stage, timing["ttft"])
+        if timing.get("error"): m.count("errors", stage)
+        m.observe("prompt_chars", stage, sum(len(str(v)) for v in inputs.values()))
+        if response is not None:
+            m.observe("response_chars", stage, len(response if isinstance(response, str) else response.model_dump_json()))
+        for field in ("input_tokens", "output_tokens"):
+            if field in timing: m.observe(field, stage, timing[field])
+
+    @staticmethod
+    def _estimate_tokens(inputs):
+        return sum(len(str(v)) for v in inputs.values()) // 4 + OUTPUT_TOKEN_ESTIMATE
+
+    def _stream(self, chain, inputs, timing, fallback, stage, priority):
+        # Records time-to-first-token, total time and token usage into `timing` as it goes.
+        # Failures before the first token are retried through the scheduler; after that
+        # the partial answer stands.
+        timing = {} if timing is None else timing
+        start = time.perf_counter()
+        est = self._estimate_tokens(inputs)
+        got_text = False
+        text = ""
+        attempt = 0
+        while True:
+            try:
+                self.scheduler.acquire(priority, est)
+                for chunk in chain.stream(inputs):
+                    self._count_tokens(timing, chunk)
+                    if not chunk.content: continue
+                    if not got_text:
+                        timing["ttft"] = round(time.perf_counter() - start, 3)
+                        got_text = True
+                    text += chunk.content
+                    yield chunk.content
+            except Exception as e:
+                attempt += 1
+                delay = None if got_text else self.scheduler.retry_delay(e, attempt, priority, stage)
+                if delay is not None:
+                    time.sleep(delay)
+                    continue
+                timing["error"] = True
+                if not got_text:
+                    self.metrics.count("fallbacks", stage)
+                    yield fallback
+                    got_text = True
+            break
+        if not got_text: yield "..."
+        self.scheduler.settle(est, timing.get("input_tokens", 0) + timing.get("output_tokens", 0))
+        timing["total"] = round(time.perf_counter() - start, 3)
+        self._record(stage, timing, inputs, text)
+
+    async def _ainvoke(self, chain, inputs, timing, stage, priority):
+        timing = {} if timing is None else timing
+        start = time.perf_counter()
+        res = None
+        try:
+            res = await self.scheduler.arun(lambda: chain.ainvoke(inputs), priority, self._estimate_tokens(inputs), stage=stage)
+            self._count_tokens(timing, res)
+            return res
+        except Exception:
+            timing["error"] = True
+            self.metrics.count("fallbacks", stage)
+            raise
+        finally:
+            timing["total"] = round(time.perf_counter() - start, 3)
+            self._record(stage, timing, inputs, getattr(res, "content", res))
+
+    def _opening_inputs(self, topic, persona, stance, language_name):
+        return {"persona": persona, "topic": topic, "stance": stance, "language": language_name}
+
+    def _rebuttal_inputs(self, topic, argument, history, persona, stance, language_name, memory=None):
+        hist_text = memory.context(history) if memory else format_turns(history[-4:])
+        return {
+            "persona": persona, 
+            "topic": topic, 
+            "stance": stance, 
+            "hist_text": hist_text, 
+            "argument": argument,
+            "language": language_name
+        }
+
+    def _cached_opening(self, topic, persona, stance, language_name, timing):
+        text = self.openings.get(topic, persona, stance, language_name)
+        self.metrics.count("cache_hits" if text else "cache_misses", "opening")
+        if text and timing is not None:
+            timing.update(ttft=0.0, total=0.0, cached=True)
+        return text
+
+    async def agenerate_opening(self, topic, persona, stance, language_name, timing=None, priority="interactive"):
+        cached = self._cached_opening(topic, persona, stance, language_name, timing)
+        if cached: return cached
+        try:
+            self._used("opening")
+            res = await self._ainvoke(self.opening_chain, self._opening_inputs(topic, persona, stance, language_name), timing, "opening", priority)
+            self.openings.put(topic, persona, stance, language_name, res.content)
+            return res.content
+        except Exception: return "System Error: Could not generate opening."
+
+    def stream_opening(self, topic, persona, stance, language_name, timing=None, priority="interactive"):
+        timing = {} if timing is None else timing
+        cached = self._cached_opening(topic, persona, stance, language_name, timing)
+        if cached:
+            yield cached
+            return
+        self._used("opening")
+        inputs = self._opening_inputs(topic, persona, stance, language_name)
+        parts = []
+        for chunk in self._stream(self.opening_chain, inputs, timing, "System Error: Could not generate opening.", "opening", priority):
+            parts.append(chunk)
+            yield chunk
+        if not timing.get("error"):
+            self.openings.put(topic, persona, stance, language_name, "".join(parts))
+
+    async def aprefetch_opening(self, topic, persona, stance, language_name, lang_code=None, delay=0.0, started=None):
+        """Speculative opening for settings the user may start with, as (text, timing, audio_key).
+
+        Waits `delay` seconds first, so a job for settings that are still
+        changing is cancelled before it costs anything, then sets the
+        `started` threading.Event if given. Audio is synthesized too when
+        `lang_code` is given. Runs below interactive priority.
+        """
+        await asyncio.sleep(delay)
+        if started: started.set()
+        self.metrics.count("started", "prefetch")
+        try:
+            timing = {}
+            text = await self.agenerate_opening(topic, persona, stance, language_name, timing, priority="report")
+            audio_key = await self.aspeak(text, lang_code) if lang_code and not timing.get("error") else None
+            return text, timing, audio_key
+        except asyncio.CancelledError:
+            self.metrics.count("misses", "prefetch")
+            raise
+
+    def prewarm_openings(self, combos=None, concurrency=2, progress=None):
+        """Fill the opening cache up to its variant count for every combination.
+
+        Runs at the lowest scheduler priority, at most `concurrency` calls at a
+        time, and returns the number of openings generated. `progress(done, total)`
+        is called after each one.
+        """
+        combos = opening_combinations() if combos is None else combos
+        todo = [c for c in combos for _ in range(max(0, self.openings.variants - self.openings.count(*c)))]
+        pending = iter(todo)
+        counts = {"done": 0, "generated": 0}
+        lock = threading.Lock()
+        ctx = contextvars.copy_context()
+
+        def work():
+            while True:
+                with lock:
+                    combo = next(pending, None)
+                if combo is None: return
+                try:
+                    self._used("opening")
+                    res = self.run_async(self._ainvoke(self.opening_chain, self._opening_inputs(*combo), None,
+                                                       "prewarm", "prewarm")).result()
+                    self.openings.put(*combo, res.content)
+                    ok = 1
+                except Exception: ok = 0
+                with lock:
+                    counts["done"] += 1
+                    counts["generated"] += ok
+                    if progress: progress(counts["done"], len(todo))
+
+        # Plain daemon threads rather than an executor, so an unfinished prewarm never blocks exit.
+        workers = [threading.Thread(target=ctx.copy().run, args=(work,), name="prewarm", daemon=True)
+                   for _ in range(concurrency)]
+        for w in workers: w.start()
+        for w in workers: w.join()
+        return counts["generated"]
+
+    def start_prewarm(self, concurrency=2):
+        """Run prewarm_openings() on a daemon thread, so it never holds up shutdown."""
+        thread = threading.Thread(target=self.prewarm_openings, kwargs={"concurrency": concurrency},
+                                  name="prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    async def agenerate_rebuttal(self, topic, argument, history, persona, stance, language_name, timing=None, priority="interactive", memory=None):
+        try:
+            self._used("rebuttal")
+            inputs = self._rebuttal_inputs(topic, argument, history, persona, stance, language_name, memory)
+            res = await self._ainvoke(self.rebuttal_chain, inputs, timing, "rebuttal", priority)
+            if not res.content: return "..."
+            return res.content
+        except Exception: 
+            return f"Error responding in {language_name}."
+
+    def stream_rebuttal(self, topic, argument, history, persona, stance, language_name, timing=None, priority="interactive", memory=None):
+        self._used("rebuttal")
+        inputs = self._rebuttal_inputs(topic, argument, history, persona, stance, language_name, memory)
+        return self._stream(self.rebuttal_chain, inputs, timing, f"Error responding in {language_name}.", "rebuttal", priority)
+
+    def prejudge(self, argument, history, lang_code):
+        """A heuristic TurnScore for a junk, repeated or wrong-script user turn, or None if it needs the judge."""
+        with self.metrics.span("prejudge"):
+            verdict = check_turn(argument, history, lang_code)
+        if verdict is None: return None
+        self.metrics.count("skips", "prejudge")
+        self.metrics.count(verdict.kind, "prejudge")
+        return TurnScore(**verdict.score_fields())
+
+    async def ajudge_turn(self, topic, user_arg, ai_arg, timing=None, priority="judge"):
+        try:
+            self._used("judge")
+            return await self._ainvoke(self.judge_chain, {"topic": topic, "user_arg": user_arg, "ai_arg": ai_arg}, timing, "judge", priority)
+        except Exception:
+            if timing is not None: timing["error"] = True
+            return TurnScore(user_logic=50, ai_logic=50, winner="draw", reasoning="Error", fallacies_detected="None")
+
+    @staticmethod
+    def _sim_judge_inputs(topic, p1, p2, pairs):
+        exchanges = "\n".join(f"Exchange {i}:\nUser: \"{u}\"\nAI: \"{a}\"" for i, (u, a) in enumerate(pairs, 1))
+        return {"topic": topic, "p1": p1, "p2": p2, "exchanges": exchanges, "count": len(pairs)}
+
+    async def ajudge_simulation(self, topic, p1, p2, turns, priority="simulation", timings=None):
+        """One TurnScore per exchange of a finished simulation, from a single batched call.
+
+        Falls back to judging the exchanges in parallel if the batch fails or
+        returns the wrong number of scores; `timings` (one dict per exchange)
+        record any of those calls that fail.
+        """
+        pairs = sim_exchanges(turns)
+        timings = timings or [None] * len(pairs)
+        try:
+            self._used("judge")
+            res = await self._ainvoke(self.sim_judge_chain, self._sim_judge_inputs(topic, p1, p2, pairs), None, "judge.batch", priority)
+            if res and len(res.exchanges) == len(pairs): return res.exchanges
+            self.metrics.count("fallbacks", "judge.batch")
+        except Exception: pass
+        return await asyncio.gather(*(self.ajudge_turn(topic, u, a, t, priority) for (u, a), t in zip(pairs, timings)))
+
+    async def arebut_and_judge(self, topic, argument, history, persona, stance, language_name, timing=None, memory=None):
+        """Rebuttal and its TurnScore from one structured call, as (rebuttal, score).
+
+        Falls back to agenerate_rebuttal() plus ajudge_turn() when the call
+        fails or the reply can't be parsed. `timing` then describes the
+        fallback rebuttal, with the failed attempt under "combined", the judge
+        call under "judge", and "total" covering all three.
+        """
+        timing = {} if timing is None else timing
+        start = time.perf_counter()
+        inputs = self._rebuttal_inputs(topic, argument, history, persona, stance, language_name, memory)
+        combined = {}
+        try:
+            self._used("combined")
+            res = await self._ainvoke(self.combined_chain, inputs, combined, "combined", "interactive")
+            if res and res.rebuttal.strip():
+                timing.update(combined)
+                return res.rebuttal, res.verdict
+            self.metrics.count("fallbacks", "combined")
+        except Exception: pass
+        rebuttal = await self.agenerate_rebuttal(topic, argument, history, persona, stance, language_name, timing, memory=memory)
+        timing["combined"], timing["judge"] = combined, {}
+        score = await self.ajudge_turn(topic, argument, rebuttal, timing["judge"])
+        timing["total"] = round(time.perf_counter() - start, 3)
+        return rebuttal, score
+
+    async def agenerate_report(self, history, topic, language_name, timing=None, memory=None):
+        hist_text = memory.context(history) if memory else format_turns(history)
+        try:
+            self._used("report")
+            return await self._ainvoke(self.report_chain, {"history": hist_text, "topic": topic, "language": language_name}, timing, "report", "report")
+        except Exception: return None
+
+    def _memory_inputs(self, memory, turns, topic, language_name):
+        return {
+            "topic": topic,
+            "summary": memory.summary or "(none yet)",
+            "turns": format_turns(turns),
+            "language": language_name,
+            "words": memory.summary_tokens * 3 // 4
+        }
+
+    async def aupdate_memory(self, memory, history, topic, language_name, priority="report"):
+        """Fold turns that have left memory's raw window into its summary.
+
+        Meant to run in the background after a turn. If another update is
+        already running for this memory, this call does nothing; the next one
+        catches up.
+        """
+        if not memory.lock.acquire(blocking=False): return
+        try:
+            turns = memory.pending(history)
+            if not turns: return
+            upto = memory.summarized + len(turns)
+            self._used("memory")
+            try:
+                res = await self._ainvoke(self.summary_chain, self._memory_inputs(memory, turns, topic, language_name),
+                                          None, "memory", priority)
+            except Exception: return
+            if res.content: memory.fold(res.content, upto)
+        finally:
+            memory.lock.release()
+
+    def follow_up(self, topic, user_arg, rebuttal, lang_code, with_audio=True, score=None, session_id=None, turn_id=None):
+        """Start TTS and judging of a finished rebuttal side by side on the event loop.
+
+        Returns (first_clip_future, audio_future, score_future). The first
+        resolves to the mp3 of the rebuttal's first sentence, the second to the
+        cache key of the whole clip; both are None when audio is off.
+        A `score` that is already known (combined turn mode) is returned as a done future.
+        All jobs belong to `turn_id`, so a newer turn cancels them.
+        """
+        first = Future() if with_audio else None
+        audio = self.run_async(self.aspeak(rebuttal, lang_code, first), session_id, turn_id) if with_audio else None
+        if score is None:
+            return first, audio, self.run_async(self.ajudge_turn(topic, user_arg, rebuttal), session_id, turn_id)
+        done = Future()
+        done.set_result(score)
+        return first, audio, done
+
+    async def asimulate(self, topic, p1, p2, language_name, rounds=SIM_ROUNDS, scoring=None):
+        """Run one headless AI vs AI debate with the same turn order as Sim mode.
+
+        p1 argues For and opens; p2 argues Against. Returns the turns in order,
+        each with the persona, stance, text and its timing/token counts. Unless
+        `scoring` (default: the engine's sim_scoring) is "off", every turn after
+        the first also has the "score" of the exchange it closes, and its
+        timing a "judge" entry that is marked as an error if the judge failed;
+        see summarize_simulation() and sim_errors().
+        """
+        scoring = scoring or self.sim_scoring
+        history, turns, judges = [], [], []
+        memory = DebateMemory()
+        update = None
+
+        def record(role, persona, stance, content, timing):
+            nonlocal update
+            history.append({"role": role, "content": content})
+            turns.append({"role": role, "persona": persona, "stance": stance, "content": content, "timing": timing})
+            if update is None or update.done():
+                update = asyncio.create_task(self.aupdate_memory(memory, list(history), topic, language_name, "simulation"))
+            if scoring == "parallel" and len(turns) > 1:
+                user_arg, ai_arg = sim_exchanges(turns[-2:])[0]
+                judge_timing = timing.setdefault("judge", {})
+                judges.append(asyncio.create_task(self.ajudge_turn(topic, user_arg, ai_arg, judge_timing, "simulation")))
+
+        timing = {}
+        prev_arg = await self.agenerate_opening(topic, p1, "For", language_name, timing, priority="simulation")
+        record("user", p1, "For", prev_arg, timing)
+
+        for i in range(rounds):
+            for role, persona, stance in (("assistant", p2, "Against"), ("user", p1, "For")):
+                if role == "user" and i == rounds - 1: break
+                timing = {}
+                prev_arg = await self.agenerate_rebuttal(topic, prev_arg, history, persona, stance, language_name, timing,
+                                                         priority="simulation", memory=memory)
+                record(role, persona, stance, prev_arg, timing)
+        update.cancel()
+        if scoring == "parallel":
+            scores = await asyncio.gather(*judges)
+        elif scoring == "batch":
+            timings = [turn["timing"].setdefault("judge", {}) for turn in turns[1:]]
+            scores = await self.ajudge_simulation(topic, p1, p2, turns, timings=timings)
+        else:
+            scores = []
+        for turn, score in zip(turns[1:], scores):
+            turn["score"] = score.model_dump()
+        return turns
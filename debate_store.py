@@ -0,0 +1,153 @@
+"""Persistent, append-only record of every debate.
+
+Turns, scores and audio references are written to SQLite as they happen,
+so a session keeps only ids and counters in st.session_state. The UI pages
+the transcript in as needed. A debate left unfinished by a worker restart
+can be picked up again from its id, and exports are streamed row by row
+instead of being built in memory.
+
+Rows are only ever inserted. The single exception is ended_at on
+`debates`, which is set once when the game is over.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+STORE_PATH = os.environ.get(
+    "DEBATE_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".debates.db")
+)
+
+EXPORT_FORMATS = {"txt": "text/plain", "md": "text/markdown", "jsonl": "application/jsonl"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS debates (
+    id TEXT PRIMARY KEY, session_id TEXT, mode TEXT NOT NULL, topic TEXT NOT NULL, language TEXT NOT NULL,
+    details TEXT NOT NULL, started_at REAL NOT NULL, ended_at REAL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    debate_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, speaker TEXT, content TEXT NOT NULL,
+    timing TEXT, created_at REAL NOT NULL, PRIMARY KEY (debate_id, seq)
+);
+CREATE TABLE IF NOT EXISTS scores (
+    debate_id TEXT NOT NULL, seq INTEGER NOT NULL, user_logic INTEGER, ai_logic INTEGER, winner TEXT,
+    reasoning TEXT, fallacies TEXT, user_hp INTEGER NOT NULL, ai_hp INTEGER NOT NULL, created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_debate ON scores (debate_id, created_at);
+CREATE TABLE IF NOT EXISTS audio (
+    debate_id TEXT NOT NULL, seq INTEGER NOT NULL, audio_key TEXT NOT NULL, PRIMARY KEY (debate_id, seq)
+);
+"""
+
+
+class DebateStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+
+    def _write(self, sql, params):
+        with self._lock, self._db:
+            self._db.execute(sql, params)
+
+    def _read(self, sql, params):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # -- writes ------------------------------------------------------------
+
+    def start(self, session_id, mode, topic, language_name, **details):
+        """Record a new debate and return its id. `details` (persona, stances, ...) is kept as JSON."""
+        debate_id = uuid.uuid4().hex
+        self._write("INSERT INTO debates (id, session_id, mode, topic, language, details, started_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (debate_id, session_id, mode, topic, language_name, json.dumps(details), time.time()))
+        return debate_id
+
+    def add_turn(self, debate_id, role, content, speaker=None, timing=None):
+        """Append a turn and return its sequence number."""
+        with self._lock, self._db:
+            seq = self._db.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM turns WHERE debate_id = ?", (debate_id,)).fetchone()[0]
+            self._db.execute("INSERT INTO turns (debate_id, seq, role, speaker, content, timing, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (debate_id, seq, role, speaker, content, json.dumps(timing) if timing else None, time.time()))
+        return seq
+
+    def add_audio(self, debate_id, seq, audio_key):
+        if audio_key:
+            self._write("INSERT OR IGNORE INTO audio (debate_id, seq, audio_key) VALUES (?, ?, ?)", (debate_id, seq, audio_key))
+
+    def add_score(self, debate_id, seq, score, user_hp, ai_hp):
+        """Record the judge's verdict on turn `seq` and both players' HP after it."""
+        self._write("INSERT INTO scores (debate_id, seq, user_logic, ai_logic, winner, reasoning, fallacies, user_hp, ai_hp, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (debate_id, seq, score.user_logic, score.ai_logic, score.winner, score.reasoning,
+                     score.fallacies_detected, user_hp, ai_hp, time.time()))
+
+    def finish(self, debate_id, user_hp, ai_hp):
+        """Mark the debate over; the final HP is appended as a score row without a verdict."""
+        with self._lock, self._db:
+            done = self._db.execute("UPDATE debates SET ended_at = ? WHERE id = ? AND ended_at IS NULL", (time.time(), debate_id))
+            if done.rowcount:
+                self._db.execute("INSERT INTO scores (debate_id, seq, user_hp, ai_hp, created_at) VALUES (?, -1, ?, ?, ?)",
+                                 (debate_id, user_hp, ai_hp, time.time()))
+
+    # -- reads -------------------------------------------------------------
+
+    def debate(self, debate_id):
+        """The debate's settings, current HP and turn count, or None if unknown."""
+        rows = self._read("SELECT * FROM debates WHERE id = ?", (debate_id,))
+        if not rows: return None
+        row = rows[0]
+        hp = self._read("SELECT user_hp, ai_hp FROM scores WHERE debate_id = ? ORDER BY created_at DESC LIMIT 1", (debate_id,))
+        return {
+            "id": row["id"], "session_id": row["session_id"], "mode": row["mode"], "topic": row["topic"],
+            "language": row["language"], **json.loads(row["details"]),
+            "started_at": row["started_at"], "ended_at": row["ended_at"],
+            "user_hp": hp[0]["user_hp"] if hp else 100, "ai_hp": hp[0]["ai_hp"] if hp else 100,
+            "turns": self.turn_count(debate_id),
+        }
+
+    def turn_count(self, debate_id):
+        return self._read("SELECT COUNT(*) FROM turns WHERE debate_id = ?", (debate_id,))[0][0]
+
+    def turns(self, debate_id, start=0, limit=-1):
+        """Turns `start`.. (at most `limit` of them) as message dicts with role, content, speaker, audio, timing."""
+        rows = self._read("SELECT t.seq, t.role, t.speaker, t.content, t.timing, a.audio_key FROM turns t "
+                          "LEFT JOIN audio a ON a.debate_id = t.debate_id AND a.seq = t.seq "
+                          "WHERE t.debate_id = ? AND t.seq >= ? ORDER BY t.seq LIMIT ?", (debate_id, start, limit))
+        return [{
+            "seq": r["seq"], "role": r["role"], "speaker": r["speaker"], "content": r["content"],
+            "audio": r["audio_key"], "timing": json.loads(r["timing"]) if r["timing"] else {},
+        } for r in rows]
+
+    def export(self, debate_id, fmt="txt", page_size=200):
+        """Yield the transcript as text chunks in `fmt` (txt, md or jsonl), reading `page_size` turns at a time."""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        info = self.debate(debate_id)
+        if info is None: return
+        if fmt == "txt":
+            yield f"TOPIC: {info['topic']}\nLANGUAGE: {info['language']}\n\n"
+        elif fmt == "md":
+            yield f"# {info['topic']}\n\n*Language: {info['language']}*\n\n"
+        else:
+            yield json.dumps({"type": "debate", **info}, ensure_ascii=False) + "\n"
+        start = 0
+        while True:
+            page = self.turns(debate_id, start, page_size)
+            for turn in page:
+                name = turn["speaker"] or ("YOU" if turn["role"] == "user" else "AI")
+                if fmt == "txt":
+                    yield f"[{name}]: {turn['content']}\n\n"
+                elif fmt == "md":
+                    yield f"**{name}:** {turn['content']}\n\n"
+                else:
+                    yield json.dumps({"type": "turn", **turn}, ensure_ascii=False) + "\n"
+            if len(page) < page_size: break
+            start = page[-1]["seq"] + 1
@@ -0,0 +1,51 @@
+"""Bounded prompt context for long debates.
+
+DebateMemory keeps the last few turns verbatim and folds everything older
+into a running summary with a fixed token budget. DebateEngine.aupdate_memory()
+does the folding, usually in the background after a turn. Rebuttal and
+report prompts then use context() instead of the raw history, so prompt
+size stays about the same however long the debate runs.
+"""
+import threading
+
+
+def format_turns(turns):
+    return "\n".join(f"{m['role']}: {m['content']}" for m in turns)
+
+
+class DebateMemory:
+    def __init__(self, raw_turns=4, fold_size=4, summary_tokens=200):
+        self.raw_turns = raw_turns
+        self.fold_size = fold_size
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.summarized = 0  # number of leading history entries already in the summary
+        self.lock = threading.Lock()  # held while an update is folding turns in
+
+    def pending(self, history):
+        """Entries that should be folded into the summary now, or [] if it isn't worth a call yet.
+
+        Folding waits until `fold_size` entries have left the raw window, so a
+        debate costs one summary call per few turns rather than one per turn.
+        """
+        cutoff = len(history) - self.raw_turns
+        if cutoff - self.summarized < self.fold_size:
+            return []
+        return history[self.summarized:cutoff]
+
+    def fold(self, summary, upto):
+        max_chars = self.summary_tokens * 4
+        self.summary = summary if len(summary) <= max_chars else summary[:max_chars].rsplit(" ", 1)[0] + " ..."
+        self.summarized = upto
+
+    def context(self, history):
+        """Summary of older turns plus every turn not yet folded into it, verbatim.
+
+        That is at most `raw_turns + fold_size - 1` entries between folds (a
+        few more while a background update is still running), so no turn is
+        ever left out of the prompt.
+        """
+        recent = format_turns(history[self.summarized:])
+        if not self.summary:
+            return recent
+        return f"Summary of earlier turns: {self.summary}\nRecent turns:\n{recent}"
@@ -0,0 +1,209 @@
+"""In-process performance metrics for the engine and the UI.
+
+Everything is recorded per stage ("rebuttal", "judge", "ui.turn", ...)
+both process-wide and for the session bound with bind_session(), so the
+sidebar can show the current user's numbers while /metrics-style exports
+cover the whole worker.
+
+Histograms keep cumulative buckets (for Prometheus) plus a window of the
+most recent values (for rolling percentiles).
+"""
+import contextvars
+import json
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, math.inf)
+SIZE_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000, math.inf)
+
+_session = contextvars.ContextVar("debate_session", default=None)
+
+
+def bind_session(session_id):
+    """Attribute everything recorded in this context (and tasks copied from it) to a session."""
+    _session.set(session_id)
+
+
+class RollingHistogram:
+    def __init__(self, buckets, window=1000):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def percentile(self, q):
+        if not self.recent: return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class _Store:
+    def __init__(self, window):
+        self.window = window
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, name, stage, value):
+        hist = self.histograms.get((name, stage))
+        if hist is None:
+            buckets = LATENCY_BUCKETS if name.endswith("_seconds") else SIZE_BUCKETS
+            hist = self.histograms[(name, stage)] = RollingHistogram(buckets, self.window)
+        hist.observe(value)
+
+    def count(self, name, stage, n):
+        self.counters[(name, stage)] = self.counters.get((name, stage), 0) + n
+
+    def gauge(self, name, stage, value):
+        self.gauges[(name, stage)] = value
+
+
+class Metrics:
+    def __init__(self, window=1000, session_window=200, max_sessions=500):
+        self._lock = threading.Lock()
+        self._global = _Store(window)
+        self._sessions = OrderedDict()
+        self.session_window = session_window
+        self.max_sessions = max_sessions
+
+    def _stores(self):
+        stores = [self._global]
+        session_id = _session.get()
+        if session_id is not None:
+            store = self._sessions.get(session_id)
+            if store is None:
+                store = self._sessions[session_id] = _Store(self.session_window)
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            stores.append(store)
+        return stores
+
+    def observe(self, name, stage, value):
+        with self._lock:
+            for store in self._stores():
+                store.observe(name, stage, value)
+
+    def count(self, name, stage, n=1):
+        with self._lock:
+            for store in self._stores():
+                store.count(name, stage, n)
+
+    def gauge(self, name, stage, value):
+        """Current value of something process-wide, e.g. a queue depth (not kept per session)."""
+        with self._lock:
+            self._global.gauge(name, stage, value)
+
+    @contextmanager
+    def span(self, stage):
+        """Time a block as `latency_seconds`; an escaping Exception also counts as an error.
+
+        Streamlit's st.rerun()/st.stop() raise BaseException subclasses and are not errors.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.count("errors", stage)
+            raise
+        finally:
+            self.observe("latency_seconds", stage, time.perf_counter() - start)
+
+    def counter(self, name, stage, session_id=None):
+        """Current value of a counter, process-wide or for one session."""
+        with self._lock:
+            store = self._global if session_id is None else self._sessions.get(session_id)
+            return store.counters.get((name, stage), 0) if store else 0
+
+    def stage_table(self, session_id=None):
+        """One row per stage: calls, latency percentiles (ms), errors, fallbacks, retries, tokens."""
+        with self._lock:
+            store = self._global if session_id is None else self._sessions.get(session_id)
+            if store is None: return []
+            stages = sorted({stage for _, stage in store.histograms} | {stage for _, stage in store.counters})
+            rows = []
+            for stage in stages:
+                latency = store.histograms.get(("latency_seconds", stage))
+                ms = lambda q: round(latency.percentile(q) * 1000) if latency and latency.recent else None
+                tokens = sum(store.histograms[(n, stage)].sum for n in ("input_tokens", "output_tokens")
+                             if (n, stage) in store.histograms)
+                row = {
+                    "stage": stage,
+                    "calls": latency.count if latency else 0,
+                    "p50_ms": ms(50),
+                    "p95_ms": ms(95),
+                    "errors": store.counters.get(("errors", stage), 0),
+                    "fallbacks": store.counters.get(("fallbacks", stage), 0),
+                    "retries": store.counters.get(("retries", stage), 0),
+                    "tokens": int(tokens),
+                }
+                if row["calls"] or row["errors"] or row["fallbacks"] or row["retries"]:
+                    rows.append(row)
+            return rows
+
+    def to_prometheus(self, prefix="debate"):
+        lines = []
+        with self._lock:
+            by_name = {}
+            for (name, stage), hist in self._global.histograms.items():
+                by_name.setdefault(name, []).append((stage, hist))
+            for name, series in sorted(by_name.items()):
+                lines.append(f"# TYPE {prefix}_{name} histogram")
+                for stage, hist in sorted(series, key=lambda s: s[0]):
+                    cumulative = 0
+                    for bound, n in zip(hist.buckets, hist.counts):
+                        cumulative += n
+                        le = "+Inf" if bound == math.inf else repr(float(bound))
+                        lines.append(f'{prefix}_{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                    lines.append(f'{prefix}_{name}_sum{{stage="{stage}"}} {hist.sum}')
+                    lines.append(f'{prefix}_{name}_count{{stage="{stage}"}} {hist.count}')
+            by_name = {}
+            for (name, stage), value in self._global.counters.items():
+                by_name.setdefault(name, []).append((stage, value))
+            for name, series in sorted(by_name.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                for stage, value in sorted(series):
+                    lines.append(f'{prefix}_{name}_total{{stage="{stage}"}} {value}')
+            by_name = {}
+            for (name, stage), value in self._global.gauges.items():
+                by_name.setdefault(name, []).append((stage, value))
+            for name, series in sorted(by_name.items()):
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                for stage, value in sorted(series):
+                    lines.append(f'{prefix}_{name}{{stage="{stage}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def to_jsonl(self):
+        ts = time.time()
+        lines = []
+        with self._lock:
+            for (name, stage), hist in sorted(self._global.histograms.items()):
+                lines.append(json.dumps({"ts": ts, "metric": name, "stage": stage, "type": "histogram", **hist.summary()}))
+            for (name, stage), value in sorted(self._global.counters.items()):
+                lines.append(json.dumps({"ts": ts, "metric": name, "stage": stage, "type": "counter", "value": value}))
+            for (name, stage), value in sorted(self._global.gauges.items()):
+                lines.append(json.dumps({"ts": ts, "metric": name, "stage": stage, "type": "gauge", "value": value}))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,77 @@
+"""Persistent cache of opening arguments.
+
+Openings depend only on (topic, persona, stance, language), and the app
+offers few enough of those that they can be generated ahead of time. The
+cache keeps several variants per key in SQLite and serves one at random, so
+replays of the same setup still vary. Entries expire after `ttl` seconds,
+and the oldest entries go first once there are more than `max_rows`.
+
+A key is only served once it holds `variants` fresh entries. Until then the
+engine generates openings live and adds them here, so the first few games
+on a new topic still produce new text.
+"""
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+
+OPENING_CACHE_PATH = os.environ.get(
+    "DEBATE_OPENING_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".opening_cache.db")
+)
+
+
+def opening_key(topic, persona, stance, language_name):
+    raw = "\0".join([topic.strip().lower(), persona, stance, language_name])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class OpeningCache:
+    def __init__(self, path=OPENING_CACHE_PATH, variants=3, ttl=7 * 86400, max_rows=5000):
+        self.path = path
+        self.variants = variants
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        # One connection shared by the engine's threads; WAL lets a prewarm process write alongside.
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS openings (key TEXT NOT NULL, text TEXT NOT NULL, created_at REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS openings_key ON openings (key, created_at)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS openings_age ON openings (created_at)")
+
+    def _fresh(self, key):
+        rows = self._db.execute("SELECT text FROM openings WHERE key = ? AND created_at > ?",
+                                (key, time.time() - self.ttl)).fetchall()
+        return [r[0] for r in rows]
+
+    def count(self, topic, persona, stance, language_name):
+        with self._lock:
+            return len(self._fresh(opening_key(topic, persona, stance, language_name)))
+
+    def get(self, topic, persona, stance, language_name):
+        """A random fresh variant, or None while the key has fewer than `variants` of them."""
+        with self._lock:
+            texts = self._fresh(opening_key(topic, persona, stance, language_name))
+        return random.choice(texts) if len(texts) >= self.variants else None
+
+    def put(self, topic, persona, stance, language_name, text):
+        if not text or not text.strip(): return
+        key = opening_key(topic, persona, stance, language_name)
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO openings (key, text, created_at) VALUES (?, ?, ?)", (key, text, now))
+            # Keep the newest `variants` per key, then enforce TTL and the overall size cap.
+            self._db.execute("DELETE FROM openings WHERE key = ? AND rowid NOT IN "
+                             "(SELECT rowid FROM openings WHERE key = ? ORDER BY created_at DESC LIMIT ?)",
+                             (key, key, self.variants))
+            self._db.execute("DELETE FROM openings WHERE created_at <= ?", (now - self.ttl,))
+            self._db.execute("DELETE FROM openings WHERE rowid IN (SELECT rowid FROM openings ORDER BY created_at DESC "
+                             "LIMIT -1 OFFSET ?)", (self.max_rows,))
+
+    def stats(self):
+        with self._lock:
+            rows, keys = self._db.execute("SELECT COUNT(*), COUNT(DISTINCT key) FROM openings").fetchone()
+        return {"openings": rows, "keys": keys}
@@ -0,0 +1,114 @@
+"""Cheap local checks that run before a user turn is sent to the judge.
+
+Some turns don't need a model to score them: near-copies of an earlier turn
+(the player's own or the opponent's), replies written in the wrong script
+for the chosen language, and filler that is too short or repetitive to be
+an argument. check() catches these with string work only, so a turn costs a
+fraction of a millisecond, and returns the reason plus TurnScore fields the
+engine can use instead of judging (and rebutting) the turn.
+
+Similarity uses a bottom-k MinHash sketch of character 5-grams, which works
+the same for every script and needs no tokenizer. Sketches are memoized by
+text, so earlier turns are only fingerprinted once.
+
+Romanised text is always allowed for the Indian languages, since players
+often type Hindi or Marathi in Latin letters.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+SHINGLE = 5
+SKETCH_SIZE = 32
+REPEAT_SIMILARITY = 0.8
+MAX_COMPARED = 40  # most recent turns checked for repeats
+MIN_LETTERS = 12
+MIN_WORDS = 3
+MIN_UNIQUE_RATIO = 0.35  # share of distinct words, for replies of 6+ words
+WRONG_SCRIPT_SHARE = 0.5
+
+# Script of each LANGUAGES code and its Unicode 128-codepoint block (ord >> 7).
+# Blocks 0-4 (ASCII, Latin-1, Latin Extended) count as Latin.
+SCRIPTS = {"en": ("Latin", None), "hi": ("Devanagari", 0x12), "mr": ("Devanagari", 0x12), "pa": ("Gurmukhi", 0x14),
+           "gu": ("Gujarati", 0x15), "ta": ("Tamil", 0x17), "te": ("Telugu", 0x18), "kn": ("Kannada", 0x19)}
+
+# Heuristic scores, as TurnScore fields. The AI wins by a small margin, so a
+# skipped turn costs the player 15-20 HP rather than a full judged loss.
+_SCORES = {
+    "junk": {"user_logic": 5, "ai_logic": 20, "winner": "ai", "fallacies_detected": "None"},
+    "wrong_language": {"user_logic": 10, "ai_logic": 25, "winner": "ai", "fallacies_detected": "None"},
+    "repeat": {"user_logic": 20, "ai_logic": 40, "winner": "ai", "fallacies_detected": "Argument by repetition"},
+}
+
+_SPACE = re.compile(r"\s+")
+# ASCII and general punctuation, plus the danda; \W would also strip Indic vowel signs.
+_PUNCT = re.compile("[!-/:-@\\[-`{-~\u0964\u0965\u2010-\u205e]")
+
+
+class Verdict:
+    def __init__(self, kind, reason):
+        self.kind = kind  # "junk", "wrong_language" or "repeat"
+        self.reason = reason
+
+    def score_fields(self):
+        return {**_SCORES[self.kind], "reasoning": self.reason}
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _SPACE.sub(" ", _PUNCT.sub(" ", text)).strip()
+
+
+def sketch(normalized):
+    """The SKETCH_SIZE smallest shingle hashes of an already normalized text.
+
+    hash() is salted per process, which is fine: sketches are never stored.
+    """
+    if len(normalized) <= SHINGLE:
+        return frozenset([hash(normalized)])
+    hashes = {hash(normalized[i:i + SHINGLE]) for i in range(len(normalized) - SHINGLE + 1)}
+    return frozenset(sorted(hashes)[:SKETCH_SIZE])
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(text):
+    return sketch(normalize(text))
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two sketches."""
+    union = sorted(a | b)[:SKETCH_SIZE]
+    cutoff = union[-1]
+    return sum(1 for h in a & b if h <= cutoff) / len(union)
+
+
+def check(argument, history, lang_code):
+    """Verdict for a user turn that can be scored without the judge, or None.
+
+    `history` is the debate so far (message dicts with role and content),
+    not including `argument`.
+    """
+    norm = normalize(argument)
+    words = norm.split()
+    letters = [c for c in norm if unicodedata.category(c)[0] in "LM"]  # Indic vowel signs and viramas are M*
+    if len(letters) < MIN_LETTERS or len(words) < MIN_WORDS:
+        return Verdict("junk", "Too short to count as an argument.")
+    if len(words) >= 6 and len(set(words)) / len(words) < MIN_UNIQUE_RATIO:
+        return Verdict("junk", "Repetitive filler rather than an argument.")
+
+    if lang_code in SCRIPTS:
+        name, block = SCRIPTS[lang_code]
+        off = sum(1 for c in letters if ord(c) >> 7 >= 5 and ord(c) >> 7 != block)
+        if off / len(letters) > WRONG_SCRIPT_SHARE:
+            return Verdict("wrong_language", f"Not written in the debate's language ({name} script expected).")
+
+    mine = fingerprint(argument)  # cached, so it is free when this turn is compared against later
+    for msg in history[-MAX_COMPARED:]:
+        other = fingerprint(msg["content"])
+        # The estimate can't exceed shared / larger sketch, so most turns are ruled out without sorting.
+        if len(mine & other) < REPEAT_SIMILARITY * max(len(mine), len(other)): continue
+        if similarity(mine, other) >= REPEAT_SIMILARITY:
+            if msg["role"] == "user":
+                return Verdict("repeat", "Repeats an earlier argument instead of adding a new one.")
+            return Verdict("repeat", "Copies the opponent's own argument back.")
+    return None
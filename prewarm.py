@@ -0,0 +1,45 @@
+"""Fill the persistent opening cache ahead of time.
+
+Generates openings for every built-in (topic, persona, stance, language)
+combination until each has the cache's full set of variants. Keys that are
+already full are skipped, so the script can be re-run (e.g. from cron) to
+top up entries that expired.
+
+    python prewarm.py --concurrency 4
+    python prewarm.py --topics "Cats are better than dogs" --languages English Hindi
+"""
+import argparse
+import os
+import time
+
+from backends import make_backend
+from debate_engine import DebateEngine, LANGUAGES, opening_combinations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate cached opening arguments.")
+    parser.add_argument("--topics", nargs="+", help="Topics to use instead of the built-in list")
+    parser.add_argument("--languages", nargs="+", choices=list(LANGUAGES), help="Languages (default: all)")
+    parser.add_argument("--concurrency", type=int, default=2, help="Openings generated at once")
+    parser.add_argument("--backend", choices=["gemini", "fake"], default=os.environ.get("DEBATE_BACKEND", "gemini"),
+                        help="Model backend; 'fake' runs offline with simulated latency")
+    parser.add_argument("--fake-latency", type=float, default=0.3, help="Fake backend: seconds per call")
+    args = parser.parse_args()
+
+    options = {"latency": args.fake_latency} if args.backend == "fake" else {}
+    engine = DebateEngine(backend=make_backend(args.backend, os.environ.get("GOOGLE_API_KEY"), **options))
+    if engine.init_error:
+        raise SystemExit(f"Initialization Error: {engine.init_error}")
+
+    combos = opening_combinations(args.topics, args.languages)
+    print(f"{len(combos)} combinations, cache at {engine.openings.path}: {engine.openings.stats()}")
+    start = time.time()
+    generated = engine.prewarm_openings(
+        combos, args.concurrency,
+        progress=lambda done, total: print(f"\r{done}/{total}", end="", flush=True)
+    )
+    print(f"\nGenerated {generated} openings in {time.time() - start:.1f}s: {engine.openings.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Process-wide, rate-limit-aware scheduler for model API calls.
+
+Every Gemini call made by DebateEngine is admitted here first. Requests
+wait in one queue ordered by priority class (live rebuttals before
+judging, judging before reports, reports before batch simulations,
+simulations before cache prewarming) and are released only when the
+requests-per-minute and tokens-per-minute buckets allow it. Each class has a bounded queue and a default deadline.
+A request that cannot get in raises SchedulerBusy, and the engine turns
+that into its usual fallback. Retryable failures (429/quota, 5xx,
+timeouts) back off with jittered exponential delays. A quota error also
+pauses all admissions briefly, so the other sessions don't keep hitting
+the limit.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+PRIORITIES = {"interactive": 0, "judge": 1, "report": 2, "simulation": 3, "prewarm": 4}
+QUEUE_LIMITS = {"interactive": 64, "judge": 64, "report": 32, "simulation": 256, "prewarm": 16}
+DEADLINES = {"interactive": 30.0, "judge": 30.0, "report": 60.0, "simulation": 300.0, "prewarm": 600.0}
+
+_RETRYABLE_MARKERS = ("429", "resourceexhausted", "quota", "rate limit", "500", "502", "503", "504",
+                      "unavailable", "timeout", "timed out", "deadline")
+_QUOTA_MARKERS = ("429", "resourceexhausted", "quota", "rate limit")
+
+
+class SchedulerBusy(RuntimeError):
+    """The request was rejected (queue full) or waited past its deadline."""
+
+
+def _describe(exc):
+    return f"{type(exc).__name__} {exc}".lower()
+
+
+def is_retryable(exc):
+    """An exception can say so itself with a `retryable` attribute; otherwise its message decides."""
+    if isinstance(exc, SchedulerBusy): return False
+    if getattr(exc, "retryable", None) is not None: return bool(exc.retryable)
+    return any(marker in _describe(exc) for marker in _RETRYABLE_MARKERS)
+
+
+def is_quota_error(exc):
+    return any(marker in _describe(exc) for marker in _QUOTA_MARKERS)
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, holding at most `burst` of them."""
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1.0, per_minute / 6)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n, now):
+        """Seconds until `n` units can be taken (a request larger than the burst waits for a full bucket)."""
+        self._refill(now)
+        need = min(n, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+    def take(self, n):
+        self.level -= n
+
+    def give_back(self, n):
+        self.level = min(self.capacity, self.level + n)
+
+
+class RequestScheduler:
+    """`share` scales the configured limits, for processes that split one API quota between them."""
+
+    def __init__(self, rpm=None, tpm=None, max_retries=3, base_delay=0.5, max_delay=8.0, metrics=None, share=1.0):
+        rpm = (rpm or float(os.environ.get("DEBATE_RPM", 1000))) * share
+        tpm = (tpm or float(os.environ.get("DEBATE_TPM", 1_000_000))) * share
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = metrics
+        self._cond = threading.Condition()
+        self._queue = []
+        self._depth = dict.fromkeys(PRIORITIES, 0)
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+
+    # -- admission -------------------------------------------------------
+
+    def _enqueue(self, priority, est_tokens, deadline_at):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        with self._cond:
+            if self._depth[priority] >= QUEUE_LIMITS[priority]:
+                self._count("rejected", priority)
+                raise SchedulerBusy(f"{priority} queue is full")
+            now = time.monotonic()
+            ticket = [PRIORITIES[priority], next(self._seq), priority, est_tokens,
+                      deadline_at or now + DEADLINES[priority], now]
+            heapq.heappush(self._queue, ticket)
+            self._depth[priority] += 1
+            self._gauge_depth(priority)
+            return ticket
+
+    def _try_grant(self, ticket):
+        """Under the lock: (granted, seconds to wait before asking again)."""
+        now = time.monotonic()
+        if now > ticket[4]:
+            self._drop(ticket)
+            self._count("deadline_exceeded", ticket[2])
+            raise SchedulerBusy(f"{ticket[2]} request waited past its deadline")
+        # Expired tickets stay queued until their own waiter drops them; skip past them.
+        if self._queue[0] is not ticket and min(t for t in self._queue if now <= t[4]) is not ticket:
+            return False, 0.05
+        wait = max(self._paused_until - now,
+                   self.requests.wait_time(1, now),
+                   self.tokens.wait_time(ticket[3], now))
+        if wait > 0:
+            return False, min(wait, ticket[4] - now)
+        if self._queue[0] is ticket:
+            heapq.heappop(self._queue)
+        else:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+        self._depth[ticket[2]] -= 1
+        self.requests.take(1)
+        self.tokens.take(ticket[3])
+        self._gauge_depth(ticket[2])
+        if self.metrics:
+            self.metrics.observe("queue_wait_seconds", f"sched.{ticket[2]}", now - ticket[5])
+        self._cond.notify_all()
+        return True, 0.0
+
+    def _drop(self, ticket):
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        self._depth[ticket[2]] -= 1
+        self._gauge_depth(ticket[2])
+        self._cond.notify_all()
+
+    def acquire(self, priority, est_tokens, deadline_at=None):
+        """Block until admitted; `deadline_at` is a time.monotonic() value (default: the class deadline)."""
+        ticket = self._enqueue(priority, est_tokens, deadline_at)
+        with self._cond:
+            while True:
+                granted, wait = self._try_grant(ticket)
+                if granted: return
+                self._cond.wait(timeout=max(wait, 0.001))
+
+    async def aacquire(self, priority, est_tokens, deadline_at=None):
+        ticket = self._enqueue(priority, est_tokens, deadline_at)
+        granted = False
+        try:
+            while True:
+                with self._cond:
+                    granted, wait = self._try_grant(ticket)
+                if granted: return
+                await asyncio.sleep(min(max(wait, 0.001), 0.05))
+        except BaseException:
+            # Cancelled (superseded turn, discarded prefetch) while queued: give the slot back.
+            if not granted:
+                with self._cond:
+                    if any(t is ticket for t in self._queue): self._drop(ticket)
+            raise
+
+    def settle(self, est_tokens, actual_tokens):
+        """Correct the token bucket once the real usage of a request is known."""
+        if not actual_tokens: return
+        with self._cond:
+            if actual_tokens > est_tokens:
+                self.tokens.take(actual_tokens - est_tokens)
+            else:
+                self.tokens.give_back(est_tokens - actual_tokens)
+
+    # -- retries -----------------------------------------------------------
+
+    def retry_delay(self, exc, attempt, priority, stage=None):
+        """Backoff before retry number `attempt` (1-based), or None if `exc` should not be retried.
+
+        Retries are counted under `stage` when given, else under the priority class.
+        """
+        if attempt > self.max_retries or not is_retryable(exc):
+            return None
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = random.uniform(delay / 2, delay)
+        if is_quota_error(exc):
+            with self._cond:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        if self.metrics:
+            self.metrics.count("retries", stage or f"sched.{priority}")
+        return delay
+
+    async def arun(self, fn, priority, est_tokens, deadline=None, stage=None):
+        """Await fn() once admitted, retrying retryable failures. Returns fn's result.
+
+        `fn` is a coroutine function. `deadline` (seconds) covers the whole
+        call including retries.
+        """
+        deadline_at = time.monotonic() + (deadline or DEADLINES[priority])
+        attempt = 0
+        while True:
+            await self.aacquire(priority, est_tokens, deadline_at)
+            try:
+                result = await fn()
+            except Exception as e:
+                attempt += 1
+                delay = self.retry_delay(e, attempt, priority, stage)
+                if delay is None: raise
+                await asyncio.sleep(delay)
+                continue
+            self.settle(est_tokens, _usage_tokens(result))
+            return result
+
+    # -- reporting -----------------------------------------------------------
+
+    def _count(self, name, priority):
+        if self.metrics:
+            self.metrics.count(name, f"sched.{priority}")
+
+    def _gauge_depth(self, priority):
+        if self.metrics:
+            self.metrics.gauge("queue_depth", f"sched.{priority}", self._depth[priority])
+
+    def snapshot(self):
+        with self._cond:
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return {
+                "queue_depth": dict(self._depth),
+                "requests_available": round(self.requests.level, 1),
+                "tokens_available": round(self.tokens.level),
+                "paused_for_s": round(max(0.0, self._paused_until - now), 2),
+            }
+
+
+def _usage_tokens(result):
+    usage = getattr(result, "usage_metadata", None) or {}
+    return usage.get("total_tokens") or 0
@@ -0,0 +1,134 @@
+"""Headless batch runner for AI vs AI debates.
+
+Runs many (topic, p1, p2, language) simulations concurrently through one
+shared DebateEngine and appends one JSON record per finished debate to the
+output file. Debates already present in the output are skipped, so an
+interrupted run can simply be restarted with the same arguments.
+
+    python simulate.py --out sims.jsonl --concurrency 16 --languages English Hindi --repeats 3
+    python simulate.py --jobs jobs.jsonl --out sims.jsonl
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import time
+
+from backends import make_backend
+from debate_engine import (DebateEngine, LANGUAGES, TOPICS, SIM_PROPONENTS, SIM_OPPONENTS, SIM_ROUNDS, SIM_SCORING,
+                           SIM_SCORING_MODES, sim_errors, summarize_simulation)
+
+
+def job_id(job):
+    raw = "\0".join([job["topic"], job["p1"], job["p2"], job["language"], str(job.get("repeat", 0))])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def build_jobs(args):
+    if args.jobs:
+        with open(args.jobs, encoding="utf-8") as f:
+            jobs = [json.loads(line) for line in f if line.strip()]
+    else:
+        jobs = [
+            {"topic": t, "p1": p1, "p2": p2, "language": lang, "repeat": r}
+            for t, p1, p2, lang, r in itertools.product(
+                args.topics or TOPICS, args.p1 or SIM_PROPONENTS, args.p2 or SIM_OPPONENTS,
+                args.languages, range(args.repeats)
+            )
+        ]
+    for job in jobs:
+        job.setdefault("repeat", 0)
+        job["id"] = job.get("id") or job_id(job)
+    return jobs
+
+
+def finished_ids(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                continue  # a partial last line from a crash; that debate is re-run
+    return done
+
+
+async def run_job(engine, job, rounds, limit):
+    async with limit:
+        start = time.time()
+        turns = await engine.asimulate(job["topic"], job["p1"], job["p2"], job["language"], rounds)
+        return {
+            **job,
+            "started_at": start,
+            "duration_s": round(time.time() - start, 3),
+            "errors": sim_errors(turns),
+            "input_tokens": sum(t["timing"].get("input_tokens", 0) for t in turns),
+            "output_tokens": sum(t["timing"].get("output_tokens", 0) for t in turns),
+            "scorecard": summarize_simulation(turns, job["p1"], job["p2"]),
+            "turns": turns,
+        }
+
+
+async def run(args):
+    options = {}
+    if args.backend == "fake":
+        options = {"latency": args.fake_latency, "jitter": args.fake_jitter, "failure_rate": args.fake_failure_rate,
+                   "transient": args.fake_transient}
+    engine = DebateEngine(backend=make_backend(args.backend, os.environ.get("GOOGLE_API_KEY"), **options),
+                          sim_scoring=args.scoring)
+    if engine.init_error:
+        raise SystemExit(f"Initialization Error: {engine.init_error}")
+
+    done = finished_ids(args.out)
+    jobs = [j for j in build_jobs(args) if j["id"] not in done]
+    print(f"{len(done)} debates already in {args.out}, {len(jobs)} to run")
+
+    limit = asyncio.Semaphore(args.concurrency)
+    tasks = [asyncio.create_task(run_job(engine, job, args.rounds, limit)) for job in jobs]
+    start = time.time()
+    with open(args.out, "a", encoding="utf-8") as out:
+        for n, task in enumerate(asyncio.as_completed(tasks), 1):
+            record = await task
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"[{n}/{len(jobs)}] {record['p1']} vs {record['p2']} | {record['topic']} "
+                  f"({record['language']}) {record['duration_s']}s, winner: {record['scorecard']['winner']}"
+                  + (f", {record['errors']} failed calls" if record["errors"] else ""))
+    if jobs:
+        elapsed = time.time() - start
+        print(f"Finished {len(jobs)} debates in {elapsed:.1f}s ({len(jobs) / elapsed * 60:.1f}/min)")
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(engine.metrics.to_jsonl() if args.metrics.endswith(".jsonl") else engine.metrics.to_prometheus())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run AI vs AI debates in bulk and write them to JSONL.")
+    parser.add_argument("--out", default="simulations.jsonl", help="JSONL file to append results to")
+    parser.add_argument("--jobs", help="JSONL file of {topic, p1, p2, language} jobs (default: all built-in combinations)")
+    parser.add_argument("--topics", nargs="+", help="Topics to use instead of the built-in list")
+    parser.add_argument("--p1", nargs="+", help="Proponent personas (argue For)")
+    parser.add_argument("--p2", nargs="+", help="Opponent personas (argue Against)")
+    parser.add_argument("--languages", nargs="+", default=["English"], choices=list(LANGUAGES), help="Debate languages, e.g. English Hindi")
+    parser.add_argument("--repeats", type=int, default=1, help="Debates per combination")
+    parser.add_argument("--rounds", type=int, default=SIM_ROUNDS, help="Rebuttal exchanges per debate")
+    parser.add_argument("--scoring", choices=SIM_SCORING_MODES, default=SIM_SCORING,
+                        help="Judge each exchange as it happens (parallel), all at the end in one call (batch), or not at all")
+    parser.add_argument("--concurrency", type=int, default=8, help="Debates in flight at once")
+    parser.add_argument("--metrics", help="Write engine metrics here at the end (.jsonl for JSONL, else Prometheus text)")
+    parser.add_argument("--backend", choices=["gemini", "fake"], default=os.environ.get("DEBATE_BACKEND", "gemini"),
+                        help="Model backend; 'fake' runs offline with simulated latency")
+    parser.add_argument("--fake-latency", type=float, default=0.3, help="Fake backend: seconds per call")
+    parser.add_argument("--fake-jitter", type=float, default=0.1, help="Fake backend: +/- seconds of random jitter")
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0, help="Fake backend: fraction of calls that fail")
+    parser.add_argument("--fake-transient", action="store_true",
+                        help="Fake backend: failures are transient, so the scheduler retries them")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
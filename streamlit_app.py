@@ -1,15 +1,17 @@
 import streamlit as st
+import io
+import os
 import uuid
 import time
-import google.generativeai as genai
 import random
-import hashlib  
-from gtts import gTTS
-from io import BytesIO
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from pydantic import BaseModel, Field
-from typing import List
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+from debate_store import DebateStore, EXPORT_FORMATS
+from debate_engine import (DebateEngine, DEFAULT_TOPIC, LANGUAGES, TOPICS, USER_PERSONAS, SIM_PROPONENTS, SIM_OPPONENTS,
+                           sim_exchanges, summarize_simulation, turn_damage)
+from memory import DebateMemory
+from metrics import bind_session
+from transcription import read_upload
 
 st.set_page_config(page_title="AI Debate Arena", page_icon="⚔️", layout="wide")
 
@@ -28,177 +30,211 @@ st.markdown("""
 try:
     GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]
 except:
-    GOOGLE_API_KEY = "PASTE_YOUR_KEY_HERE"
-
-genai.configure(api_key=GOOGLE_API_KEY)
-
-LANGUAGES = {
-    "English": "en",
-    "Hindi": "hi",
-    "Gujarati": "gu",
-    "Marathi": "mr",
-    "Tamil": "ta",
-    "Telugu": "te",
-    "Kannada": "kn",
-    "Punjabi": "pa"
-}
-
-class TurnScore(BaseModel):
-    user_logic: int = Field(..., description="0-100 score for logic")
-    ai_logic: int = Field(..., description="0-100 score for logic")
-    winner: str = Field(..., description="'user', 'ai', or 'draw'")
-    reasoning: str = Field(..., description="Brief reason for the score")
-    fallacies_detected: str = Field(..., description="Name any logical fallacies used (or 'None')")
-
-class FinalAnalysis(BaseModel):
-    winner: str
-    best_point_user: str = Field(..., description="Quote the user's strongest argument")
-    weakest_point_user: str = Field(..., description="Quote the user's weakest argument")
-    improvement_tips: List[str] = Field(..., description="3 specific things the user should remember to improve")
-
-class DebateEngine:
-    def __init__(self):
-        try:
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash", 
-                google_api_key=GOOGLE_API_KEY,
-                temperature=0.8 
-            )
-        except Exception as e:
-            st.error(f"Initialization Error: {e}")
-
-    def speak(self, text, lang_code='en'):
-        try:
-            if not text: return None
-            tts = gTTS(text=text, lang=lang_code)
-            fp = BytesIO()
-            tts.write_to_fp(fp)
-            return fp
-        except: return None
-
-    def transcribe_audio(self, audio_file, language_name="English"):
-        try:
-            model = genai.GenerativeModel("gemini-2.5-flash")
-            audio_bytes = audio_file.read()
-            prompt = f"Transcribe this audio exactly as spoken. The language is likely {language_name}."
-            response = model.generate_content([prompt, {"mime_type": "audio/mp3", "data": audio_bytes}])
-            return response.text
-        except Exception as e:
-            st.error(f"Transcription Error: {e}")
-            return None
-
-    def generate_opening(self, topic, persona, stance, language_name):
-        template = f"""
-        You are {{persona}}. Topic: {{topic}}. Stance: {{stance}}.
-        Target Language: {{language}}.
-        
-        Generate a sharp, provocative 2-sentence opening argument completely in {{language}}.
-        DO NOT use English unless the requested language is English.
-        DO NOT be neutral. Pick a side and fight for it.
-        """
-        try:
-            prompt = ChatPromptTemplate.from_template(template)
-            chain = prompt | self.llm
-            res = chain.invoke({"persona": persona, "topic": topic, "stance": stance, "language": language_name})
-            return res.content
-        except: return "System Error: Could not generate opening."
-
-    def generate_rebuttal(self, topic, argument, history, persona, stance, language_name):
-        hist_text = "\n".join([f"{m['role']}: {m['content']}" for m in history[-4:]])
-        template = f"""
-        You are {{persona}}. Topic: {{topic}}. Stance: {{stance}}.
-        Target Language: {{language}}.
-        History: {{hist_text}}
-        Opponent says: "{{argument}}"
-        
-        TASK: Dissect the opponent's argument and provide a logical counter-point.
-        CONSTRAINT: 
-        1. Write the response STRICTLY in {{language}}.
-        2. Never say "I disagree". Instead, explain WHY they are wrong.
-        3. Keep it under 3 sentences.
-        """
-        try:
-            prompt = ChatPromptTemplate.from_template(template)
-            chain = prompt | self.llm
-            res = chain.invoke({
-                "persona": persona, 
-                "topic": topic, 
-                "stance": stance, 
-                "hist_text": hist_text, 
-                "argument": argument,
-                "language": language_name
-            })
-            if not res.content: return "..."
-            return res.content
-        except Exception as e: 
-            return f"Error responding in {language_name}."
-
-    def judge_turn(self, topic, user_arg, ai_arg):
-        template = f"""
-        Judge turn. Topic: {{topic}}.
-        User: "{{user_arg}}"
-        AI: "{{ai_arg}}"
-        
-        Score logic (0-100) strictly based on facts and reasoning.
-        """
-        try:
-            structured = self.llm.with_structured_output(TurnScore)
-            prompt = ChatPromptTemplate.from_template(template)
-            chain = prompt | structured
-            return chain.invoke({"topic": topic, "user_arg": user_arg, "ai_arg": ai_arg})
-        except: return TurnScore(user_logic=50, ai_logic=50, winner="draw", reasoning="Error", fallacies_detected="None")
-
-    def generate_report(self, history, topic, language_name):
-        hist_text = "\n".join([f"{m['role']}: {m['content']}" for m in history])
-        template = """
-        Analyze the full debate history. Topic: {topic}.
-        History: {history}
-        Target Language for output: {language}
-        
-        Task:
-        1. Identify the Winner.
-        2. Find the User's BEST point (quote it).
-        3. Find the User's WEAKEST point (quote it).
-        4. Provide 3 specific tips for the user to improve next time.
-        
-        IMPORTANT: Ensure the 'improvement_tips' and analysis are written in {language}.
-        """
-        try:
-            structured = self.llm.with_structured_output(FinalAnalysis)
-            prompt = ChatPromptTemplate.from_template(template)
-            chain = prompt | structured
-            return chain.invoke({"history": hist_text, "topic": topic, "language": language_name})
-        except: return None
+    GOOGLE_API_KEY = None
+
+# Start the end-of-game report alongside judging once either side is this low,
+# since a single decisive hit (usually 30-50 HP) can then end the game.
+REPORT_PREFETCH_HP = 50
+
+# Transcript turns shown at once; earlier pages load on request.
+HISTORY_PAGE = 20
+
+# When the AI is set to open, its opening (and audio) is generated speculatively once
+# the sidebar has been left alone this long, at most PREFETCH_BUDGET times per session.
+PREFETCH_SETTLE_S = 1.5
+PREFETCH_BUDGET = int(os.environ.get("DEBATE_PREFETCH_BUDGET", 5))
+
+# Process-wide metrics cover every session on this worker, so their downloads are operator-only.
+METRICS_EXPORT = os.environ.get("DEBATE_METRICS_EXPORT") == "1"
+
+@st.cache_resource
+def get_engine():
+    engine = DebateEngine(api_key=GOOGLE_API_KEY)
+    # Opt-in, since a full prewarm makes a few thousand API calls.
+    if os.environ.get("DEBATE_PREWARM") and not engine.init_error:
+        engine.start_prewarm()
+    return engine
 
-engine = DebateEngine()
+engine = get_engine()
+if engine.init_error:
+    st.error(f"Initialization Error: {engine.init_error}")
+
+@st.cache_resource
+def get_store():
+    return DebateStore()
+
+store = get_store()
 
 def update_topic():
-    topics = [
-        "Is cereal a soup?", "AI will replace teachers", "Cats are better than dogs", 
-        "Pineapple belongs on pizza", "Mars colonization is a waste",
-        "Social media does more harm than good", "Video games cause violence",
-        "Messi or Ronaldo: Who's the GOAT?",
-    ]
-    st.session_state.topic_input = random.choice(topics)
+    st.session_state.topic_input = random.choice(TOPICS)
+
+def apply_damage(score):
+    user_dmg, ai_dmg = turn_damage(score)
+    if score.winner == "ai":
+        st.session_state.user_hp = max(0, st.session_state.user_hp - user_dmg)
+        st.session_state.crowd_text = f"Ouch! {score.fallacies_detected} detected!"
+        st.toast(f"💥 HIT! You lost {user_dmg} HP!", icon="🩸")
+        
+    elif score.winner == "user":
+        st.session_state.ai_hp = max(0, st.session_state.ai_hp - ai_dmg)
+        st.session_state.crowd_text = "Superior logic! Crowd cheers!"
+        st.toast(f"🎯 CRITICAL! AI lost {ai_dmg} HP!", icon="🔥")
+        
+    else:
+        st.session_state.crowd_text = "Even exchange."
+        st.toast(" Blocked! No damage 🛡️", icon="🛡️")
+
+def report_job(history):
+    """Future for the report on `history`, started at most once per debate and turn count.
+
+    Turns are append-only, so the count identifies the history. A report that
+    failed (None, an exception or a cancelled job) is started again, and
+    starting one cancels the reports on shorter histories.
+    """
+    topic, lang_name = st.session_state.topic, st.session_state.selected_lang_name
+    key = (st.session_state.debate_id, len(history))
+    jobs = st.session_state.setdefault("report_jobs", {})
+    job = jobs.get(key)
+    if job and job.done() and (job.cancelled() or job.exception() is not None or job.result() is None):
+        del jobs[key]
+    if key not in jobs:
+        cancel_reports()
+        snapshot = [{"role": m["role"], "content": m["content"]} for m in history]
+        jobs[key] = engine.run_async(engine.agenerate_report(snapshot, topic, lang_name, None, st.session_state.memory))
+    return jobs[key]
+
+def cancel_reports():
+    """Cancel and forget this session's report jobs; they are for histories no one will ask about again."""
+    jobs = st.session_state.setdefault("report_jobs", {})
+    for job in jobs.values(): job.cancel()
+    jobs.clear()
+
+def export_file(debate_id, fmt):
+    buf = io.BytesIO()
+    for chunk in store.export(debate_id, fmt):
+        buf.write(chunk.encode("utf-8"))
+    buf.seek(0)
+    return buf
+
+def settle(jobs, status, label):
+    """Yield the turn's jobs as they finish.
+
+    `status` is refreshed while waiting. Each refresh lets Streamlit stop this
+    run if the user has acted since, and any job still pending is cancelled.
+    """
+    pending, start = set(jobs), time.perf_counter()
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+            yield from done
+            if pending: status.info(f"⏳ {label} ({time.perf_counter() - start:.1f}s)")
+    finally:
+        for job in pending: job.cancel()
+
+def stale(turn_id):
+    return not engine.is_current(st.session_state.session_id, turn_id)
+
+def judge_latest(history, judges):
+    """Start judging the exchange closed by the newest simulation turn (parallel scoring)."""
+    if engine.sim_scoring == "parallel" and len(history) > 1:
+        user_arg, ai_arg = sim_exchanges(history[-2:])[0]
+        judges.append(engine.run_async(engine.ajudge_turn(st.session_state.topic, user_arg, ai_arg)))
+
+def render_scorecard(card):
+    p, o = card["proponent"], card["opponent"]
+    st.markdown("## 📊 Scorecard")
+    st.success(f"🏆 {card['winner']} wins!" if card["winner"] != "draw" else "🤝 It's a draw!")
+    for col, side in zip(st.columns(2), (p, o)):
+        with col:
+            st.metric(f"{side['persona']} ({side['stance']})", f"{side['hp']}%",
+                      f"avg logic {side['avg_logic']} · {side['exchanges_won']} won", delta_color="off")
+            st.progress(side["hp"] / 100)
+            st.markdown(f"""
+            <div class="report-card">
+                <div class="best-point"><strong>💎 Best Point:</strong><br><em>"{side['best_point']}"</em></div>
+                <div class="worst-point"><strong>📉 Weakest Link:</strong><br><em>"{side['weakest_point']}"</em></div>
+            </div>
+            """, unsafe_allow_html=True)
+    st.dataframe(card["timeline"], hide_index=True)
+
+def speculate(key):
+    """Keep a speculative opening running for the sidebar's current settings, replacing any for older ones."""
+    spec = st.session_state.get("prefetch")
+    if spec and spec["key"] == key: return
+    discard_prefetch(st.session_state.pop("prefetch", None))
+    if prefetches_used() >= PREFETCH_BUDGET: return
+    topic, persona, stance, lang_name, with_audio = key
+    started = threading.Event()
+    job = engine.run_async(engine.aprefetch_opening(topic, persona, stance, lang_name,
+                                                    LANGUAGES[lang_name] if with_audio else None, PREFETCH_SETTLE_S, started))
+    st.session_state.prefetch = {"key": key, "job": job, "started": started}
+
+def discard_prefetch(spec):
+    # Cancelling before the settle delay is free; a finished but unused opening is a miss.
+    if not spec: return
+    if not spec["job"].cancel():
+        engine.metrics.count("misses", "prefetch")
+    if spec["started"].is_set(): spend_prefetch()
+
+def spend_prefetch():
+    st.session_state.prefetches_used = st.session_state.get("prefetches_used", 0) + 1
+
+def prefetches_used():
+    """Prefetches this session has paid for: finished ones, plus the live one once past its settle delay.
+
+    Kept in session state, since per-session metrics are dropped on busy workers.
+    """
+    spec = st.session_state.get("prefetch")
+    return st.session_state.get("prefetches_used", 0) + bool(spec and spec["started"].is_set())
+
+def show_more_history():
+    st.session_state.history_pages += 1
+
+def resume_debate(debate_id):
+    """Pick an unfinished User vs AI debate back up from the store, e.g. after a worker restart."""
+    info = store.debate(debate_id)
+    if not info or info["mode"] != "User" or info["ended_at"]: return False
+    st.session_state.update(
+        debate_id=debate_id, started=True, mode="User", topic=info["topic"], topic_input=info["topic"],
+        persona=info["persona"], ai_side=info["ai_side"], user_hp=info["user_hp"], ai_hp=info["ai_hp"],
+        selected_lang_name=info["language"], opening_pending=False, report_jobs={}, memory=DebateMemory(),
+        audio_key=str(uuid.uuid4()), crowd_text="The debate resumes..."
+    )
+    return True
+
+def render_stream(placeholder, chunks, prefix=""):
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        placeholder.markdown(prefix + text + "▌")
+    placeholder.markdown(prefix + text)
+    return text
 
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
-    st.session_state.messages = []
+    st.session_state.debate_id = None
+    st.session_state.history_pages = 1
     st.session_state.user_hp = 100
     st.session_state.ai_hp = 100
     st.session_state.started = False
     st.session_state.crowd_text = "The arena is silent..."
     st.session_state.last_audio_hash = None 
     st.session_state.audio_key = "audio_1"
-    st.session_state.topic_input = "Universal Basic Income" 
+    st.session_state.topic_input = DEFAULT_TOPIC
     st.session_state.selected_lang_name = "English"
     st.session_state.selected_lang_code = "en"
+    st.session_state.memory = DebateMemory()
+    if "debate" in st.query_params:
+        resume_debate(st.query_params["debate"])
+
+bind_session(st.session_state.session_id)
 
 with st.sidebar:
     st.title("⚙️ Arena Setup")
     
     st.subheader("🗣️ Language / भाषा")
-    selected_lang = st.selectbox("Choose Debate Language:", options=list(LANGUAGES.keys()), index=0)
+    selected_lang = st.selectbox("Choose Debate Language:", options=list(LANGUAGES.keys()),
+                                 index=list(LANGUAGES).index(st.session_state.selected_lang_name))
     st.session_state.selected_lang_name = selected_lang
     st.session_state.selected_lang_code = LANGUAGES[selected_lang]
     
@@ -210,15 +246,34 @@ with st.sidebar:
     st.divider()
 
     with st.expander("📜 Debate Logs"):
-        if st.session_state.messages:
-            log_text = f"TOPIC: {st.session_state.topic_input}\nLANGUAGE: {st.session_state.selected_lang_name}\n\n"
-            for msg in st.session_state.messages:
-                role = "YOU" if msg['role'] == "user" else "AI"
-                log_text += f"[{role}]: {msg['content']}\n\n"
-            st.download_button("💾 Download", log_text, file_name="debate_log.txt")
+        if st.session_state.debate_id:
+            # Built from the store only when clicked, off the script thread.
+            for col, fmt in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS):
+                col.download_button(f"💾 {fmt.upper()}", lambda fmt=fmt, debate_id=st.session_state.debate_id: export_file(debate_id, fmt),
+                                    file_name=f"debate_log.{fmt}", mime=EXPORT_FORMATS[fmt])
         else:
             st.caption("No history yet.")
 
+    with st.expander("⏱️ Performance"):
+        perf_rows = engine.metrics.stage_table(st.session_state.session_id)
+        if perf_rows:
+            st.dataframe(perf_rows, hide_index=True)
+        else:
+            st.caption("No timings yet.")
+        sid = st.session_state.session_id
+        hits, misses = (engine.metrics.counter(n, "prefetch", sid) for n in ("hits", "misses"))
+        started = prefetches_used()
+        if started:
+            st.caption(f"Opening prefetch: {hits} hits · {misses} misses · {started}/{PREFETCH_BUDGET} of budget used")
+        queue = engine.scheduler.snapshot()
+        st.caption(f"Turn mode: {engine.turn_mode} · API queue: {sum(queue['queue_depth'].values())} waiting · "
+                   f"{queue['requests_available']:.0f} requests / {queue['tokens_available']} tokens available")
+        if METRICS_EXPORT:
+            # Built only when clicked, so reruns don't hold the metrics lock.
+            col_p1, col_p2 = st.columns(2)
+            col_p1.download_button("Prometheus", engine.metrics.to_prometheus, file_name="debate_metrics.prom")
+            col_p2.download_button("JSONL", engine.metrics.to_jsonl, file_name="debate_metrics.jsonl")
+
     st.divider()
 
     col_t1, col_t2 = st.columns([3, 1])
@@ -232,16 +287,27 @@ with st.sidebar:
     if mode == "User vs AI" and st.session_state.started:
         st.divider()
         if st.button("QUIT ☠️", type="primary", use_container_width=True):
+            engine.start_turn(st.session_state.session_id)  # drops any turn still in flight
             st.session_state.user_hp = 0  
             st.rerun()
 
     if mode == "User vs AI":
-        persona = st.selectbox("Opponent:", ["Logical Vulcan", "Sarcastic Troll", "Philosopher", "Devil's Advocate"])
+        persona = st.selectbox("Opponent:", USER_PERSONAS)
         ai_side = st.radio("AI Stance:", ["Against", "For"])
         who_starts = st.radio("Who starts?", ["Me (User)", "AI (Opponent)"], index=0)
+        if who_starts == "AI (Opponent)" and not st.session_state.started and PREFETCH_BUDGET:
+            speculate((st.session_state.topic_input, persona, ai_side, st.session_state.selected_lang_name, enable_audio))
+        else:
+            discard_prefetch(st.session_state.pop("prefetch", None))
         
         if st.button("Start Debate 🔥", use_container_width=True):
-            st.session_state.messages = []
+            engine.start_turn(st.session_state.session_id)
+            st.session_state.debate_id = store.start(
+                st.session_state.session_id, "User", st.session_state.topic_input, st.session_state.selected_lang_name,
+                persona=persona, ai_side=ai_side
+            )
+            st.query_params["debate"] = st.session_state.debate_id
+            st.session_state.history_pages = 1
             st.session_state.user_hp = 100
             st.session_state.ai_hp = 100
             st.session_state.started = True
@@ -252,25 +318,23 @@ with st.sidebar:
             st.session_state.last_audio_hash = None 
             st.session_state.audio_key = str(uuid.uuid4())
             
-            if who_starts == "AI (Opponent)":
-                 with st.spinner(f"{persona} is preparing..."):
-                    opening = engine.generate_opening(
-                        st.session_state.topic_input, 
-                        persona, 
-                        ai_side,
-                        st.session_state.selected_lang_name
-                    )
-                    st.session_state.messages.append({
-                        "role": "assistant", "content": opening, 
-                        "audio": engine.speak(opening, st.session_state.selected_lang_code) if enable_audio else None
-                    })
+            st.session_state.opening_pending = who_starts == "AI (Opponent)"
+            st.session_state.opening_prefetch = st.session_state.pop("prefetch", None)
+            cancel_reports()
+            st.session_state.memory = DebateMemory()
             st.rerun()
             
     else: 
-        p1 = st.selectbox("Proponent:", ["Elon Musk-esque", "Idealist Student"])
-        p2 = st.selectbox("Opponent:", ["Grumpy Boomer", "Data Scientist"])
+        p1 = st.selectbox("Proponent:", SIM_PROPONENTS)
+        p2 = st.selectbox("Opponent:", SIM_OPPONENTS)
+        discard_prefetch(st.session_state.pop("prefetch", None))
         if st.button("Run Simulation 🎬", use_container_width=True):
-            st.session_state.messages = []
+            cancel_reports()
+            st.session_state.debate_id = store.start(
+                st.session_state.session_id, "Sim", st.session_state.topic_input, st.session_state.selected_lang_name,
+                p1=p1, p2=p2
+            )
+            st.query_params.pop("debate", None)
             st.session_state.started = True
             st.session_state.mode = "Sim"
             st.session_state.p1 = p1
@@ -308,13 +372,11 @@ if st.session_state.mode == "User":
         else:
             st.error(f"💀 DEFEAT! {st.session_state.persona} wins!")
 
+        store.finish(st.session_state.debate_id, st.session_state.user_hp, st.session_state.ai_hp)
         st.markdown("## 📊 Debate Analysis")
         with st.spinner("The judges are compiling your performance report..."):
-            rep = engine.generate_report(
-                st.session_state.messages, 
-                st.session_state.topic,
-                st.session_state.selected_lang_name
-            )
+            with engine.metrics.span("ui.report_wait"):
+                rep = report_job(store.turns(st.session_state.debate_id)).result()
             
             if rep:
                 st.markdown(f"""
@@ -335,15 +397,56 @@ if st.session_state.mode == "User":
             
         if st.button("Start New Debate"):
             st.session_state.started = False
+            st.query_params.pop("debate", None)
             st.rerun()
             
         st.stop()
 
-    for msg in st.session_state.messages:
-        with st.chat_message(msg["role"]):
-            st.write(msg["content"])
-            if "audio" in msg and msg["audio"]:
-                st.audio(msg["audio"], format="audio/mp3")
+    with engine.metrics.span("ui.history"):
+        first = max(0, store.turn_count(st.session_state.debate_id) - HISTORY_PAGE * st.session_state.history_pages)
+        if first:
+            st.button(f"⬆️ Show earlier turns ({first} more)", on_click=show_more_history)
+        for msg in store.turns(st.session_state.debate_id, first):
+            with st.chat_message(msg["role"]):
+                st.write(msg["content"])
+                audio = engine.audio.get(msg["audio"]) if msg.get("audio") else None
+                if audio: st.audio(audio, format="audio/mp3")
+
+    if st.session_state.get("opening_pending"):
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
+            placeholder.info(f"⏳ {st.session_state.persona} is preparing...")
+            opening_start = time.perf_counter()
+            opening = None
+            spec = st.session_state.pop("opening_prefetch", None)
+            key = (st.session_state.topic, st.session_state.persona, st.session_state.ai_side,
+                   st.session_state.selected_lang_name, enable_audio)
+            # A job still in its settle delay has done nothing yet; cancel it and stream the opening live instead.
+            if spec and spec["key"] == key and spec["started"].is_set():
+                for job in settle([spec["job"]], placeholder, f"{st.session_state.persona} is preparing..."):
+                    if not job.cancelled() and job.exception() is None:
+                        opening, timing, audio_key = job.result()
+                        if timing.get("error"): opening = None
+            if opening is not None:
+                engine.metrics.count("hits", "prefetch")
+                spend_prefetch()
+                placeholder.markdown(opening)
+            else:
+                discard_prefetch(spec)
+                timing = {}
+                opening = render_stream(placeholder, engine.stream_opening(
+                    st.session_state.topic, 
+                    st.session_state.persona, 
+                    st.session_state.ai_side,
+                    st.session_state.selected_lang_name,
+                    timing
+                ))
+                audio_key = engine.run_async(engine.aspeak(opening, st.session_state.selected_lang_code)).result() if enable_audio else None
+            if audio_key: st.audio(engine.audio.get(audio_key), format='audio/mp3')
+            engine.metrics.observe("latency_seconds", "ui.opening", time.perf_counter() - opening_start)
+            seq = store.add_turn(st.session_state.debate_id, "assistant", opening, timing=timing)
+            store.add_audio(st.session_state.debate_id, seq, audio_key)
+        st.session_state.opening_pending = False
 
     st.markdown("### Make your move")
     
@@ -351,24 +454,30 @@ if st.session_state.mode == "User":
     voice_input = st.audio_input("🎤 Tap to Speak", key=st.session_state.audio_key)
 
     final_prompt = None
+    turn_id = None
     
     if text_input:
         final_prompt = text_input
     
     elif voice_input:
         
-        voice_input.seek(0)
-        audio_data = voice_input.read()
-        voice_input.seek(0) 
-        
-        current_audio_hash = hashlib.md5(audio_data).hexdigest()
+        clip = read_upload(voice_input)
         
-        if current_audio_hash != st.session_state.last_audio_hash:
+        if clip.digest != st.session_state.last_audio_hash:
            
-            st.session_state.last_audio_hash = current_audio_hash
-            
-            with st.spinner("Transcribing..."):
-                transcribed = engine.transcribe_audio(voice_input, st.session_state.selected_lang_name)
+            st.session_state.last_audio_hash = clip.digest
+            turn_id = engine.start_turn(st.session_state.session_id)
+            status = st.empty()
+            job = engine.run_async(engine.atranscribe(clip, st.session_state.selected_lang_name),
+                                   st.session_state.session_id, turn_id)
+            for job in settle([job], status, "Transcribing..."):
+                if job.cancelled() or stale(turn_id): st.stop()
+                try:
+                    transcribed = job.result()
+                except Exception as e:
+                    st.error(f"Transcription Error: {e}")
+                    transcribed = None
+                status.empty()
                 if not transcribed:
                     st.warning("⚠️ No clear speech detected. Please speak closer to the microphone.")
                 else:
@@ -378,55 +487,93 @@ if st.session_state.mode == "User":
             pass
 
     if final_prompt:
+        history = store.turns(st.session_state.debate_id)
         
-        if st.session_state.messages and st.session_state.messages[-1]['role'] == 'user' and st.session_state.messages[-1]['content'] == final_prompt:
+        if history and history[-1]['role'] == 'user' and history[-1]['content'] == final_prompt:
             pass 
         else:
-            st.session_state.messages.append({"role": "user", "content": final_prompt})
+            # A newer submission (or QUIT) supersedes this turn: its pending calls are cancelled
+            # and nothing below is applied once stale(turn_id).
+            turn_id = turn_id or engine.start_turn(st.session_state.session_id)
+            prejudged = engine.prejudge(final_prompt, history, st.session_state.selected_lang_code)
+            seq = store.add_turn(st.session_state.debate_id, "user", final_prompt)
+            if prejudged:
+                # Junk, repeats and wrong-language turns are scored locally, with no rebuttal.
+                apply_damage(prejudged)
+                st.session_state.crowd_text = f"The judges wave it off: {prejudged.reasoning}"
+                store.add_score(st.session_state.debate_id, seq, prejudged, st.session_state.user_hp, st.session_state.ai_hp)
+                st.rerun()
+            history.append({"role": "user", "content": final_prompt})
+            turn_start = time.perf_counter()
             
             with st.chat_message("assistant"):
-                with st.spinner(f"{st.session_state.persona} is thinking..."):
-                    
-                    rebuttal = engine.generate_rebuttal(
+                placeholder = st.empty()
+                placeholder.info(f"⏳ {st.session_state.persona} is thinking...")
+                timing = {}
+                score = None
+                if engine.turn_mode == "combined":
+                    job = engine.run_async(engine.arebut_and_judge(
                         st.session_state.topic, 
                         final_prompt, 
-                        st.session_state.messages, 
+                        history, 
                         st.session_state.persona, 
                         st.session_state.ai_side,
-                        st.session_state.selected_lang_name
-                    )
-                    
-                    audio_fp = engine.speak(rebuttal, st.session_state.selected_lang_code) if enable_audio else None
-                    st.write(rebuttal)
-                    if audio_fp: st.audio(audio_fp, format='audio/mp3')
-                    
-                    st.session_state.messages.append({"role": "assistant", "content": rebuttal, "audio": audio_fp})
-                    
-                    score = engine.judge_turn(st.session_state.topic, final_prompt, rebuttal)
-                    
-                    user_dmg = 0
-                    ai_dmg = 0
-                    
-                    if score.winner == "ai":
-                        user_dmg = int(score.ai_logic - score.user_logic)
-                        if user_dmg < 10: user_dmg = 10
-                        st.session_state.user_hp = max(0, st.session_state.user_hp - user_dmg)
-                        st.session_state.crowd_text = f"Ouch! {score.fallacies_detected} detected!"
-                        st.toast(f"💥 HIT! You lost {user_dmg} HP!", icon="🩸")
-                        
-                    elif score.winner == "user":
-                        ai_dmg = int(score.user_logic - score.ai_logic)
-                        if ai_dmg < 10: ai_dmg = 10
-                        st.session_state.ai_hp = max(0, st.session_state.ai_hp - ai_dmg)
-                        st.session_state.crowd_text = "Superior logic! Crowd cheers!"
-                        st.toast(f"🎯 CRITICAL! AI lost {ai_dmg} HP!", icon="🔥")
-                        
-                    else:
-                        st.session_state.crowd_text = "Even exchange."
-                        st.toast(" Blocked! No damage 🛡️", icon="🛡️")
+                        st.session_state.selected_lang_name,
+                        timing,
+                        memory=st.session_state.memory
+                    ), st.session_state.session_id, turn_id)
+                    for job in settle([job], placeholder, f"{st.session_state.persona} is thinking..."):
+                        if job.cancelled() or stale(turn_id): st.stop()
+                        rebuttal, score = job.result()
+                    placeholder.markdown(rebuttal)
+                else:
+                    rebuttal = render_stream(placeholder, engine.stream_rebuttal(
+                        st.session_state.topic, 
+                        final_prompt, 
+                        history, 
+                        st.session_state.persona, 
+                        st.session_state.ai_side,
+                        st.session_state.selected_lang_name,
+                        timing,
+                        memory=st.session_state.memory
+                    ))
+                if stale(turn_id): st.stop()
+
+                first_clip, audio_job, score_job = engine.follow_up(
+                    st.session_state.topic,
+                    final_prompt,
+                    rebuttal,
+                    st.session_state.selected_lang_code,
+                    with_audio=enable_audio,
+                    score=score,
+                    session_id=st.session_state.session_id,
+                    turn_id=turn_id
+                )
+                seq = store.add_turn(st.session_state.debate_id, "assistant", rebuttal, timing=timing)
+                history.append({"role": "assistant", "content": rebuttal})
+                engine.run_async(engine.aupdate_memory(st.session_state.memory, list(history),
+                                                       st.session_state.topic, st.session_state.selected_lang_name))
+                if min(st.session_state.user_hp, st.session_state.ai_hp) <= REPORT_PREFETCH_HP:
+                    report_job(history)
+
+                status, audio_spot = st.empty(), st.empty()
+                with engine.metrics.span("ui.follow_up"):
+                    for job in settle([j for j in (first_clip, audio_job, score_job) if j], status, "The judges are scoring..."):
+                        if job.cancelled() or stale(turn_id): st.stop()
+                        if job is score_job:
+                            apply_damage(job.result())
+                            store.add_score(st.session_state.debate_id, seq, job.result(),
+                                            st.session_state.user_hp, st.session_state.ai_hp)
+                        elif job is first_clip:
+                            # The first sentence plays while the rest is synthesized.
+                            if job.result() and not audio_job.done(): audio_spot.audio(job.result(), format='audio/mp3')
+                        else:
+                            audio_key = job.result()
+                            store.add_audio(st.session_state.debate_id, seq, audio_key)
+                            if audio_key: audio_spot.audio(engine.audio.get(audio_key), format='audio/mp3')
                     
-                    time.sleep(0.5) 
-                    st.rerun()
+                engine.metrics.observe("latency_seconds", "ui.turn", time.perf_counter() - turn_start)
+                st.rerun()
 
 elif st.session_state.mode == "Sim":
     st.subheader(f"🍿 Spectator Mode: {st.session_state.p1} vs {st.session_state.p2}")
@@ -434,23 +581,25 @@ elif st.session_state.mode == "Sim":
     chat_spot = st.container()
     
     if st.session_state.sim_active:
-        history = []
+        sim_start = time.perf_counter()
+        history, judges = [], []
+        memory = DebateMemory()
         lang_name = st.session_state.selected_lang_name
         
         with chat_spot:
             with st.chat_message("user", avatar="🔵"):
                 placeholder = st.empty()
                 placeholder.info(f"⏳ {st.session_state.p1} is opening...")
-                opening = engine.generate_opening(
+                timing = {}
+                opening = render_stream(placeholder, engine.stream_opening(
                     st.session_state.topic, 
                     st.session_state.p1, 
                     "For",
-                    lang_name
-                )
-                placeholder.empty()
-                st.write(f"**{st.session_state.p1}:** {opening}")
-                history.append({"role": "user", "content": opening})
-                st.session_state.messages.append({"role": "user", "content": f"{st.session_state.p1}: {opening}"})
+                    lang_name,
+                    timing
+                ), prefix=f"**{st.session_state.p1}:** ")
+                seq = store.add_turn(st.session_state.debate_id, "user", opening, st.session_state.p1, timing)
+                history.append({"role": "user", "content": opening, "seq": seq})
         
         prev_arg = opening
         progress_bar = st.progress(0, text="Debate in progress...")
@@ -463,18 +612,21 @@ elif st.session_state.mode == "Sim":
                 with st.chat_message("assistant", avatar="🔴"):
                     placeholder = st.empty()
                     placeholder.info(f"⏳ {st.session_state.p2} is reading...")
-                    reb_2 = engine.generate_rebuttal(
+                    timing = {}
+                    reb_2 = render_stream(placeholder, engine.stream_rebuttal(
                         st.session_state.topic, 
                         prev_arg, 
                         history, 
                         st.session_state.p2, 
                         "Against",
-                        lang_name
-                    )
-                    placeholder.empty()
-                    st.write(f"**{st.session_state.p2}:** {reb_2}")
-                    history.append({"role": "assistant", "content": reb_2})
-                    st.session_state.messages.append({"role": "assistant", "content": f"{st.session_state.p2}: {reb_2}"})
+                        lang_name,
+                        timing,
+                        memory=memory
+                    ), prefix=f"**{st.session_state.p2}:** ")
+                    seq = store.add_turn(st.session_state.debate_id, "assistant", reb_2, st.session_state.p2, timing)
+                    history.append({"role": "assistant", "content": reb_2, "seq": seq})
+                    judge_latest(history, judges)
+                    engine.run_async(engine.aupdate_memory(memory, list(history), st.session_state.topic, lang_name))
             
             prev_arg = reb_2
             time.sleep(0.5) 
@@ -484,24 +636,44 @@ elif st.session_state.mode == "Sim":
                     with st.chat_message("user", avatar="🔵"):
                         placeholder = st.empty()
                         placeholder.info(f"⏳ {st.session_state.p1} is thinking...")
-                        reb_1 = engine.generate_rebuttal(
+                        timing = {}
+                        reb_1 = render_stream(placeholder, engine.stream_rebuttal(
                             st.session_state.topic, 
                             prev_arg, 
                             history, 
                             st.session_state.p1, 
                             "For",
-                            lang_name
-                        )
-                        placeholder.empty()
-                        st.write(f"**{st.session_state.p1}:** {reb_1}")
-                        history.append({"role": "user", "content": reb_1})
-                        st.session_state.messages.append({"role": "user", "content": f"{st.session_state.p1}: {reb_1}"})
+                            lang_name,
+                            timing,
+                            memory=memory
+                        ), prefix=f"**{st.session_state.p1}:** ")
+                        seq = store.add_turn(st.session_state.debate_id, "user", reb_1, st.session_state.p1, timing)
+                        history.append({"role": "user", "content": reb_1, "seq": seq})
+                        judge_latest(history, judges)
+                        engine.run_async(engine.aupdate_memory(memory, list(history), st.session_state.topic, lang_name))
                 prev_arg = reb_1
 
         progress_bar.empty()
         st.session_state.sim_active = False
+        engine.metrics.observe("latency_seconds", "ui.simulation", time.perf_counter() - sim_start)
         st.balloons()
         st.success("Simulation Finished!")
+
+        hp = [100, 100]  # an unscored simulation ends level
+        if engine.sim_scoring != "off":
+            with st.spinner("The judges are scoring..."), engine.metrics.span("ui.sim_scoring"):
+                if engine.sim_scoring == "batch":
+                    scores = engine.run_async(engine.ajudge_simulation(st.session_state.topic, st.session_state.p1,
+                                                                       st.session_state.p2, history, "judge")).result()
+                else:
+                    scores = [job.result() for job in judges]
+            for turn, score in zip(history[1:], scores):
+                turn["score"] = score.model_dump()
+                user_dmg, ai_dmg = turn_damage(score)
+                hp = [max(0, hp[0] - user_dmg), max(0, hp[1] - ai_dmg)]
+                store.add_score(st.session_state.debate_id, turn["seq"], score, *hp)
+            render_scorecard(summarize_simulation(history, st.session_state.p1, st.session_state.p2))
+        store.finish(st.session_state.debate_id, *hp)
         if st.button("Clear Arena"):
             st.session_state.started = False
             st.rerun()
\ No newline at end of file
@@ -0,0 +1,17 @@
+from memory import DebateMemory, format_turns
+
+
+def test_every_turn_is_summarized_or_verbatim():
+    memory = DebateMemory(raw_turns=4, fold_size=4)
+    history = []
+    for n in range(30):
+        history.append({"role": ("user", "assistant")[n % 2], "content": f"argument {n}."})
+        turns = memory.pending(history)
+        if turns and n % 3:  # some updates lag behind, as background folds do
+            memory.fold(f"summary of {memory.summarized + len(turns)} turns", memory.summarized + len(turns))
+
+        context = memory.context(history)
+        for i, msg in enumerate(history):
+            assert i < memory.summarized or format_turns([msg]) in context
+        if not memory.pending(history):
+            assert len(history) - memory.summarized < memory.raw_turns + memory.fold_size
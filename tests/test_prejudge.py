@@ -0,0 +1,8 @@
+from prejudge import check
+
+
+def test_short_indic_arguments_are_not_junk():
+    # Vowel signs and viramas are combining marks, not letters, in Unicode.
+    assert check("పిల్లులు మంచివి కాదు", [], "te") is None
+    assert check("बिल्लियाँ अच्छी नहीं", [], "hi") is None
+    assert check("ok no u", [], "en").kind == "junk"
@@ -0,0 +1,28 @@
+import asyncio
+
+from backends import FakeBackendError
+from scheduler import QUEUE_LIMITS, RequestScheduler, is_retryable
+
+
+def test_cancelled_acquire_frees_its_queue_slot():
+    async def scenario():
+        sched = RequestScheduler(rpm=60, tpm=1_000_000)
+        sched.requests.level = 0  # nothing is admitted until the bucket refills
+        waiters = [asyncio.create_task(sched.aacquire("interactive", 10))
+                   for _ in range(QUEUE_LIMITS["interactive"])]
+        await asyncio.sleep(0.05)
+        for task in waiters: task.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert sched._queue == []
+        assert sched._depth["interactive"] == 0
+
+        sched.requests.level = 1
+        await asyncio.wait_for(sched.aacquire("interactive", 10), timeout=1)
+
+    asyncio.run(scenario())
+
+
+def test_exceptions_can_declare_themselves_retryable():
+    assert not is_retryable(FakeBackendError("Simulated backend failure"))
+    assert is_retryable(FakeBackendError("Simulated backend failure", retryable=True))
+    assert is_retryable(RuntimeError("503 Service Unavailable"))
@@ -0,0 +1,291 @@
+"""Persona tournament: rank debaters by Elo.
+
+Plays AI vs AI debates between personas, as a double round robin (every
+pair meets once on each side) or a Swiss system (each round pairs personas
+with similar scores and avoids rematches). Matches run in a process pool,
+one DebateEngine per worker, using the same simulation loop and judge as
+Sim mode. Topics and languages rotate across the schedule.
+
+Ratings are updated as each result comes in and the whole state is written
+to the checkpoint after every match, so an interrupted tournament continues
+where it stopped when re-run with the same arguments. A match with failed
+model calls is not rated and is played again on the next run.
+
+    python tournament.py --format swiss --swiss-rounds 5 --workers 4
+    python tournament.py --personas "Logical Vulcan" Philosopher "Grumpy Boomer" --languages English Hindi
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from backends import make_backend
+from debate_engine import (DebateEngine, LANGUAGES, TOPICS, USER_PERSONAS, SIM_PROPONENTS, SIM_OPPONENTS, SIM_ROUNDS,
+                           sim_errors, summarize_simulation)
+
+PERSONAS = USER_PERSONAS + SIM_PROPONENTS + SIM_OPPONENTS
+INITIAL_RATING = 1500
+
+_engine = None
+_loop = None
+
+
+def _init_worker(backend, options, scoring, workers):
+    global _engine, _loop
+    # Each worker gets an equal slice of DEBATE_RPM / DEBATE_TPM, so the tournament as a whole stays within them.
+    _engine = DebateEngine(backend=make_backend(backend, os.environ.get("GOOGLE_API_KEY"), **options), sim_scoring=scoring,
+                           quota_share=1 / workers)
+    _loop = asyncio.new_event_loop()  # one loop per worker; async clients may be bound to it
+
+
+def play(match, rounds):
+    """Run one match in a worker process and return its result record."""
+    if _engine.init_error:
+        raise RuntimeError(f"Initialization Error: {_engine.init_error}")
+    calls = _engine.reuse_stats()["total_calls"]
+    start = time.time()
+    turns = _loop.run_until_complete(
+        _engine.asimulate(match["topic"], match["p1"], match["p2"], match["language"], rounds)
+    )
+    card = summarize_simulation(turns, match["p1"], match["p2"])
+    return {
+        **match,
+        "winner": card["winner"],
+        "p1_hp": card["proponent"]["hp"], "p2_hp": card["opponent"]["hp"],
+        "p1_logic": card["proponent"]["avg_logic"], "p2_logic": card["opponent"]["avg_logic"],
+        "duration_s": round(time.time() - start, 3),
+        "api_calls": _engine.reuse_stats()["total_calls"] - calls,
+        "errors": sim_errors(turns),  # includes failed judge calls, whose fallback draws must not be rated
+    }
+
+
+def match_id(match):
+    raw = "\0".join([str(match["round"]), match["p1"], match["p2"], match["topic"], match["language"]])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def make_match(rnd, p1, p2, setting):
+    match = {"round": rnd, "p1": p1, "p2": p2, "topic": setting[0], "language": setting[1]}
+    match["id"] = match_id(match)
+    return match
+
+
+def round_robin(personas, settings):
+    """Every ordered pair, so each persona argues both For and Against against everyone."""
+    pairs = list(itertools.permutations(personas, 2))
+    return [make_match(0, p1, p2, settings[i % len(settings)]) for i, (p1, p2) in enumerate(pairs)]
+
+
+def swiss_round(rnd, state, settings):
+    """Pair personas by points, then rating, avoiding rematches where possible.
+
+    With an odd field the lowest-ranked persona without a bye sits out and
+    scores a win. Whoever has argued For less often takes the For side.
+    """
+    stats, ratings = state["stats"], state["ratings"]
+    order = sorted(stats, key=lambda p: (-stats[p]["points"], -ratings[p]))
+    bye = None
+    if len(order) % 2:
+        bye = next((p for p in reversed(order) if not stats[p]["byes"]), order[-1])
+        order.remove(bye)
+    played = {frozenset((m["p1"], m["p2"])) for m in state["matches"]}
+
+    def fresh(rest):
+        # Backtracking keeps pairings close to the standings order but avoids rematches.
+        if not rest: return []
+        for b in rest[1:]:
+            if frozenset((rest[0], b)) in played: continue
+            tail = fresh([p for p in rest[1:] if p != b])
+            if tail is not None: return [(rest[0], b)] + tail
+        return None
+
+    pairs = fresh(order) or list(zip(order[::2], order[1::2]))
+    matches = []
+    for a, b in pairs:
+        if stats[b]["for"] < stats[a]["for"]: a, b = b, a
+        matches.append(make_match(rnd, a, b, settings[(rnd * len(stats) + len(matches)) % len(settings)]))
+    return matches, bye
+
+
+def expected(rating, other):
+    return 1 / (1 + 10 ** ((other - rating) / 400))
+
+
+def rate(state, record, k):
+    """Apply one result to the Elo ratings and the standings."""
+    ratings, stats = state["ratings"], state["stats"]
+    p1, p2 = record["p1"], record["p2"]
+    score = {p1: 1.0, p2: 0.0}.get(record["winner"], 0.5)
+    e1 = expected(ratings[p1], ratings[p2])
+    ratings[p1] += k * (score - e1)
+    ratings[p2] += k * ((1 - score) - (1 - e1))
+    for persona, result, logic in ((p1, score, record["p1_logic"]), (p2, 1 - score, record["p2_logic"])):
+        s = stats[persona]
+        s["played"] += 1
+        s["points"] += result
+        s["wins" if result == 1 else "losses" if result == 0 else "draws"] += 1
+        if logic is not None:
+            s["logic_sum"] += logic
+            s["logic_n"] += 1
+    stats[p1]["for"] += 1
+    record["ratings"] = {p1: round(ratings[p1], 1), p2: round(ratings[p2], 1)}
+    state["matches"].append(record)
+
+
+def new_state(settings):
+    return {
+        "settings": settings,
+        "ratings": {p: INITIAL_RATING for p in settings["personas"]},
+        "stats": {p: {"played": 0, "wins": 0, "draws": 0, "losses": 0, "points": 0.0, "byes": 0, "for": 0,
+                      "logic_sum": 0.0, "logic_n": 0} for p in settings["personas"]},
+        "matches": [],
+        "rounds": [],
+    }
+
+
+def load_state(path, settings):
+    if not os.path.exists(path):
+        return new_state(settings)
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    if state["settings"] != settings:
+        raise SystemExit(f"{path} belongs to a tournament with different settings; pass another --checkpoint to start a new one")
+    return state
+
+
+def save_state(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path)  # never leave a half-written checkpoint behind
+
+
+def leaderboard(state):
+    rows = []
+    for persona, s in state["stats"].items():
+        rows.append({
+            "persona": persona, "rating": round(state["ratings"][persona]), "played": s["played"],
+            "wins": s["wins"], "draws": s["draws"], "losses": s["losses"], "points": s["points"],
+            "avg_logic": round(s["logic_sum"] / s["logic_n"], 1) if s["logic_n"] else None,
+        })
+    rows.sort(key=lambda r: (-r["rating"], -r["points"]))
+    return [{"rank": i, **r} for i, r in enumerate(rows, 1)]
+
+
+def write_leaderboard(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+            return
+        f.write("| " + " | ".join(rows[0]) + " |\n")
+        f.write("|" + "---|" * len(rows[0]) + "\n")
+        for row in rows:
+            f.write("| " + " | ".join("-" if v is None else str(v) for v in row.values()) + " |\n")
+
+
+def run_matches(pool, matches, args, state, totals):
+    jobs = {pool.submit(play, match, args.rounds): match for match in matches}
+    for job in as_completed(jobs):
+        match = jobs[job]
+        try:
+            record = job.result()
+        except Exception as e:
+            totals["failed"] += 1
+            print(f"  {match['p1']} vs {match['p2']}: failed ({e})")
+            continue
+        totals["api_calls"] += record["api_calls"]
+        if record["errors"]:
+            totals["failed"] += 1
+            print(f"  {match['p1']} vs {match['p2']}: {record['errors']} failed calls, will be replayed")
+            continue
+        rate(state, record, args.k_factor)
+        save_state(args.checkpoint, state)
+        totals["played"] += 1
+        print(f"  [{len(state['matches'])}] {record['p1']} vs {record['p2']} | {record['topic']} ({record['language']}) "
+              f"winner: {record['winner']}, {record['api_calls']} calls, {record['duration_s']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank debate personas with an Elo tournament of AI vs AI debates.")
+    parser.add_argument("--format", choices=["round-robin", "swiss"], default="round-robin", help="Pairing system")
+    parser.add_argument("--swiss-rounds", type=int, default=5, help="Rounds to play in a Swiss tournament")
+    parser.add_argument("--personas", nargs="+", default=PERSONAS, help="Personas to enter (default: all built-in)")
+    parser.add_argument("--topics", nargs="+", default=TOPICS, help="Topics, rotated across matches")
+    parser.add_argument("--languages", nargs="+", default=["English"], choices=list(LANGUAGES), help="Languages, rotated across matches")
+    parser.add_argument("--rounds", type=int, default=SIM_ROUNDS, help="Rebuttal exchanges per debate")
+    parser.add_argument("--scoring", choices=["parallel", "batch"], default="batch",
+                        help="How each debate is judged (batch makes fewer calls)")
+    parser.add_argument("--k-factor", type=float, default=32, help="Elo K-factor")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes (matches in flight at once)")
+    parser.add_argument("--checkpoint", default="tournament.json", help="State file; re-run with it to resume")
+    parser.add_argument("--leaderboard", default="leaderboard.md", help="Leaderboard output (.csv for CSV, else Markdown)")
+    parser.add_argument("--backend", choices=["gemini", "fake"], default=os.environ.get("DEBATE_BACKEND", "gemini"),
+                        help="Model backend; 'fake' runs offline with simulated latency")
+    parser.add_argument("--fake-latency", type=float, default=0.3, help="Fake backend: seconds per call")
+    parser.add_argument("--fake-jitter", type=float, default=0.1, help="Fake backend: +/- seconds of random jitter")
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0, help="Fake backend: fraction of calls that fail")
+    parser.add_argument("--fake-transient", action="store_true",
+                        help="Fake backend: failures are transient, so the scheduler retries them")
+    args = parser.parse_args()
+    if len(set(args.personas)) < 2:
+        parser.error("a tournament needs at least two personas")
+
+    settings = {
+        "format": args.format, "personas": sorted(set(args.personas)), "topics": args.topics,
+        "languages": args.languages, "rounds": args.rounds, "k_factor": args.k_factor,
+        "swiss_rounds": args.swiss_rounds if args.format == "swiss" else None,
+    }
+    state = load_state(args.checkpoint, settings)
+    combos = list(itertools.product(args.topics, args.languages))
+    options = {}
+    if args.backend == "fake":
+        options = {"latency": args.fake_latency, "jitter": args.fake_jitter, "failure_rate": args.fake_failure_rate,
+                   "transient": args.fake_transient}
+
+    totals = {"played": 0, "failed": 0, "api_calls": 0}
+    start = time.time()
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.backend, options, args.scoring, args.workers)) as pool:
+        if args.format == "round-robin":
+            done = {m["id"] for m in state["matches"]}
+            matches = [m for m in round_robin(settings["personas"], combos) if m["id"] not in done]
+            print(f"Round robin: {len(done)} matches already played, {len(matches)} to go")
+            run_matches(pool, matches, args, state, totals)
+        else:
+            for rnd in range(args.swiss_rounds):
+                if rnd == len(state["rounds"]):
+                    matches, bye = swiss_round(rnd, state, combos)
+                    if bye:
+                        state["stats"][bye]["points"] += 1
+                        state["stats"][bye]["byes"] += 1
+                    state["rounds"].append({"matches": matches, "bye": bye})
+                    save_state(args.checkpoint, state)
+                done = {m["id"] for m in state["matches"]}
+                pending = [m for m in state["rounds"][rnd]["matches"] if m["id"] not in done]
+                if not pending: continue
+                bye = state["rounds"][rnd]["bye"]
+                print(f"Swiss round {rnd + 1}/{args.swiss_rounds}: {len(pending)} matches" + (f", bye: {bye}" if bye else ""))
+                run_matches(pool, pending, args, state, totals)
+                if any(m["id"] not in {r["id"] for r in state["matches"]} for m in pending):
+                    break  # later pairings depend on this round; finish it on the next run
+
+    rows = leaderboard(state)
+    write_leaderboard(args.leaderboard, rows)
+    for row in rows:
+        print(f"{row['rank']:>3}. {row['persona']:<20} {row['rating']:>5}  {row['wins']}-{row['draws']}-{row['losses']}")
+    elapsed = time.time() - start
+    attempted = totals["played"] + totals["failed"]
+    if attempted:
+        print(f"Played {totals['played']} matches ({totals['failed']} failed) in {elapsed:.1f}s: "
+              f"{totals['played'] / elapsed * 60:.1f} matches/min, {totals['api_calls'] / attempted:.1f} API calls/match")
+    print(f"Leaderboard written to {args.leaderboard}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Voice input handling before transcription.
+
+An upload is read once, as a memoryview over Streamlit's buffer, and
+hashed. Its real MIME type is sniffed from the container's magic bytes
+instead of being assumed. Transcripts are cached by (audio hash, language)
+in a process-wide LRU, so a rerun or another session sending the same clip
+doesn't pay for it again.
+
+16-bit PCM WAV (what st.audio_input records) can also be shrunk before
+upload: it is cut down to its first channel, decimated towards TARGET_RATE,
+and leading/trailing silence is trimmed. Other formats are sent unchanged.
+"""
+import hashlib
+import os
+import struct
+import sys
+import threading
+from collections import OrderedDict
+
+# 0 disables downsampling; speech models don't need more than 16 kHz.
+TARGET_RATE = int(os.environ.get("DEBATE_AUDIO_RATE", 16000))
+TRIM_SILENCE = os.environ.get("DEBATE_TRIM_SILENCE", "1") != "0"
+
+SILENCE_THRESHOLD = 500  # peak amplitude of a 20 ms window, about -36 dBFS
+SILENCE_PADDING = 0.2  # seconds kept either side of the speech
+
+_MAGIC = [
+    (0, b"RIFF", 8, b"WAVE", "audio/wav"),
+    (0, b"OggS", None, None, "audio/ogg"),
+    (0, b"\x1aE\xdf\xa3", None, None, "audio/webm"),
+    (0, b"fLaC", None, None, "audio/flac"),
+    (0, b"ID3", None, None, "audio/mp3"),
+    (4, b"ftyp", None, None, "audio/mp4"),
+]
+
+
+class AudioClip:
+    def __init__(self, data, mime_type, digest):
+        self.data = data  # memoryview, not a copy
+        self.mime_type = mime_type
+        self.digest = digest
+
+
+def sniff_mime(data, declared=None):
+    """MIME type from the container header, falling back to `declared`."""
+    head = bytes(data[:12])
+    for offset, magic, offset2, magic2, mime in _MAGIC:
+        if head[offset:offset + len(magic)] == magic and (magic2 is None or head[offset2:offset2 + len(magic2)] == magic2):
+            return mime
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        return "audio/aac" if head[1] & 0x06 == 0 else "audio/mp3"  # ADTS vs MPEG audio frame sync
+    return declared or "application/octet-stream"
+
+
+def read_upload(upload):
+    """AudioClip for an uploaded file (or any bytes-like), without copying its contents."""
+    if hasattr(upload, "getbuffer"):
+        data = upload.getbuffer()
+    else:
+        data = memoryview(upload)
+    return AudioClip(data, sniff_mime(data, getattr(upload, "type", None)), hashlib.sha256(data).hexdigest())
+
+
+def _pcm16(data):
+    """(channels, rate, int16 sample view) for a 16-bit PCM WAV, else None."""
+    if sys.byteorder != "little" or bytes(data[:4]) != b"RIFF" or bytes(data[8:12]) != b"WAVE":
+        return None
+    pos, fmt = 12, None
+    while pos + 8 <= len(data):
+        chunk, size = bytes(data[pos:pos + 4]), int.from_bytes(data[pos + 4:pos + 8], "little")
+        # Recorders that stream WAV often leave the data size at 0 or 0xFFFFFFFF.
+        end = len(data) if chunk == b"data" and (size == 0 or pos + 8 + size > len(data)) else pos + 8 + size
+        body = data[pos + 8:end]
+        if chunk == b"fmt " and len(body) >= 16:
+            audio_format, channels, rate = struct.unpack_from("<HHI", body)
+            fmt = (audio_format, channels, rate, struct.unpack_from("<H", body, 14)[0])
+        elif chunk == b"data" and fmt:
+            if fmt[0] != 1 or fmt[3] != 16 or not fmt[1]: return None
+            usable = len(body) - len(body) % (2 * fmt[1])
+            return fmt[1], fmt[2], body[:usable].cast("h")
+        pos = end + (size & 1)
+    return None
+
+
+def _trim(samples, rate):
+    window = max(1, rate // 50)
+    loud = [i for i in range(0, len(samples), window)
+            if max(samples[i:i + window], default=0) > SILENCE_THRESHOLD
+            or -min(samples[i:i + window], default=0) > SILENCE_THRESHOLD]
+    if not loud: return samples  # all quiet; let the model decide
+    pad = int(SILENCE_PADDING * rate)
+    return samples[max(0, loud[0] - pad):min(len(samples), loud[-1] + window + pad)]
+
+
+def _wav(samples, rate):
+    pcm = samples.tobytes()
+    header = struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + len(pcm), b"WAVE", b"fmt ", 16, 1, 1, rate,
+                         rate * 2, 2, 16, b"data", len(pcm))
+    return header + pcm
+
+
+def prepare(clip, target_rate=TARGET_RATE, trim_silence=TRIM_SILENCE):
+    """(payload, mime_type) to upload: a smaller mono WAV when possible, else the clip as is."""
+    parsed = _pcm16(clip.data) if clip.mime_type == "audio/wav" and (target_rate or trim_silence) else None
+    if parsed is None:
+        return clip.data, clip.mime_type
+    channels, rate, samples = parsed
+    # Keep the first channel and every step-th frame. Speech has little energy above
+    # 8 kHz, so plain decimation to 16 kHz is good enough for transcription.
+    step = max(1, rate // target_rate) if target_rate else 1
+    samples = samples[::channels * step]
+    rate //= step
+    if trim_silence:
+        samples = _trim(samples, rate)
+    if len(samples) == len(parsed[2]):
+        return clip.data, clip.mime_type  # nothing removed, skip the rewrite
+    return _wav(samples, rate), "audio/wav"
+
+
+class TranscriptCache:
+    """Thread-safe LRU of transcripts keyed by (audio digest, language)."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, digest, language_name):
+        with self._lock:
+            text = self._items.get((digest, language_name))
+            if text is not None:
+                self._items.move_to_end((digest, language_name))
+            return text
+
+    def put(self, digest, language_name, text):
+        if not text: return  # failures and empty results are retried next time
+        with self._lock:
+            self._items[(digest, language_name)] = text
+            self._items.move_to_end((digest, language_name))
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)